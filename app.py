@@ -1,24 +1,94 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, current_app, g, request, jsonify, make_response, stream_with_context, url_for
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import insert, update, func, select, tuple_, and_, or_, bindparam
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.dialects.postgresql import JSONB, insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+import atexit
+import click
 import uuid
+import hashlib
+import base64
 from datetime import datetime, timedelta
 import os
 import json
 import logging
+import sys
+import time
+import threading
+import functools
+import itertools
+import random
+import urllib.request
+from urllib.parse import urlencode, urlsplit
+import migrations
+from cache import LRUCacheBackend, NullCacheBackend
+from counters import CounterBuffer
+from events import LocalBroker, PostgresBroker, TooManySubscribers, encode_event
+from jobs import WORKER_ID, WorkerPool, retry_delay
+from scheduler import DueScheduler
+from metrics import TimedQueuePool, instrument_engine, record_request, render_metrics, timed_stage
+from onboarding_templates import TemplateRegistry, encode_json
+from profiling import RequestProfile, current_profile, instrument_profiling, profiled, sign_debug_token, verify_debug_token
+from json_provider import get_provider_class
+from compression import compress_response
+from tokens import InvalidToken, TokenSigner
+from timeseries import bucket_start, roll_up
+from document_tags import normalize_tags, tag_rows
+from ingest import InvalidSample, MalformedBody, copy_rows, iter_json_array, iter_ndjson, validate_sample
+from structured_logging import configure_logging, get_log_pipeline, parse_sample_rates, request_id_var
 
-app = Flask(__name__)
-CORS(app)
+# List endpoint pagination
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 500
+# Tags on at least this many matching documents are searched by probing documents in id order
+DENSE_TAG_THRESHOLD = 5000
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///axiom_enterprise.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'axiom-enterprise-secret-key')
+db = SQLAlchemy()
+api = Blueprint('api', __name__, cli_group=None)
+logger = logging.getLogger(__name__)
 
-db = SQLAlchemy(app)
+REMINDER_STATUSES = ('active', 'completed', 'dismissed')
+
+# Subject of operator tokens for cross-client endpoints; derived client ids never take this value
+OPERATOR_CLIENT_ID = '*'
+
+# Per-client resources named in change events, one per client read endpoint family
+CHANGE_RESOURCES = ('client', 'reminders', 'documents', 'progress')
+
+# Native JSONB on Postgres, JSON-encoded text on SQLite
+JSONColumn = db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql')
+
+class CachedDictMixin:
+    """
+    Memoizes to_dict() on the instance so repeated reads of the same row skip
+    re-serialization. The cached dict is dropped whenever an attribute is
+    assigned or the instance is expired or refreshed; subclasses implement
+    serialize().
+    """
+    def __setattr__(self, key, value):
+        self.__dict__.pop('_dict_cache', None)
+        super().__setattr__(key, value)
+    
+    @profiled('serialize')
+    def to_dict(self):
+        cached = self.__dict__.get('_dict_cache')
+        if cached is None:
+            cached = self.__dict__['_dict_cache'] = self.serialize()
+        return cached
+
+@db.event.listens_for(CachedDictMixin, 'expire', propagate=True)
+@db.event.listens_for(CachedDictMixin, 'refresh', propagate=True)
+def drop_cached_dict(target, *args):
+    target.__dict__.pop('_dict_cache', None)
 
 # Database Models
-class Client(db.Model):
+class Client(CachedDictMixin, db.Model):
     __tablename__ = 'clients'
     
     id = db.Column(db.String(255), primary_key=True)
@@ -36,20 +106,24 @@ class Client(db.Model):
     payment_intent_id = db.Column(db.String(255))
     
     # JSON fields for complex data
-    business_context = db.Column(db.Text)  # JSON string
-    current_challenges = db.Column(db.Text)  # JSON string
-    recommended_solutions = db.Column(db.Text)  # JSON string
+    business_context = db.Column(JSONColumn)
+    current_challenges = db.Column(JSONColumn)
+    recommended_solutions = db.Column(JSONColumn)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self):
+    reminders = db.relationship('Reminder', order_by='Reminder.id')
+    documents = db.relationship('Document', order_by='Document.id')
+    progress_metrics = db.relationship('ProgressMetric', order_by='ProgressMetric.id')
+    
+    def serialize(self):
         return {
             'id': self.id,
             'client_name': self.company_name,
             'industry': self.industry,
             'complexity_score': self.complexity_score,
-            'assessment_date': self.assessment_date.isoformat() if self.assessment_date else None,
+            'assessment_date': self.assessment_date,
             'session_id': self.session_id,
             'customer_email': self.customer_email,
             'mentor': {
@@ -64,15 +138,20 @@ class Client(db.Model):
                 'processing_time': self.processing_time,
                 'solutions_count': self.solutions_count
             },
-            'business_context': json.loads(self.business_context) if self.business_context else {},
-            'current_challenges': json.loads(self.current_challenges) if self.current_challenges else [],
-            'recommended_solutions': json.loads(self.recommended_solutions) if self.recommended_solutions else [],
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'business_context': self.business_context or {},
+            'current_challenges': self.current_challenges or [],
+            'recommended_solutions': self.recommended_solutions or [],
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
 
 class Reminder(db.Model):
     __tablename__ = 'reminders'
+    __table_args__ = (
+        db.Index('ix_reminders_client_status_due', 'client_id', 'status', 'due_date'),
+        # Cross-client due reminder lookups and the reminder scheduler
+        db.Index('ix_reminders_status_due', 'status', 'due_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.String(255), db.ForeignKey('clients.id'), nullable=False)
@@ -83,8 +162,12 @@ class Reminder(db.Model):
     due_date = db.Column(db.DateTime, nullable=False)
     status = db.Column(db.String(20), default='active')  # active, completed, dismissed
     ai_generated = db.Column(db.Boolean, default=True)
+    # Set when the reminder scheduler claims the reminder to send its due notification
+    notified_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    @profiled('serialize')
     def to_dict(self):
         return {
             'id': self.id,
@@ -93,14 +176,17 @@ class Reminder(db.Model):
             'description': self.description,
             'priority': self.priority,
             'category': self.category,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
+            'due_date': self.due_date,
             'status': self.status,
             'ai_generated': self.ai_generated,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at
         }
 
-class Document(db.Model):
+class Document(CachedDictMixin, db.Model):
     __tablename__ = 'documents'
+    __table_args__ = (
+        db.Index('ix_documents_client_category', 'client_id', 'category'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.String(255), db.ForeignKey('clients.id'), nullable=False)
@@ -108,13 +194,14 @@ class Document(db.Model):
     description = db.Column(db.Text)
     category = db.Column(db.String(100), nullable=False)
     file_type = db.Column(db.String(50))
-    tags = db.Column(db.Text)  # JSON string
+    tags = db.Column(JSONColumn)
     is_favorite = db.Column(db.Boolean, default=False)
     download_count = db.Column(db.Integer, default=0)
     view_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self):
+    def serialize(self):
         return {
             'id': self.id,
             'client_id': self.client_id,
@@ -122,15 +209,35 @@ class Document(db.Model):
             'description': self.description,
             'category': self.category,
             'file_type': self.file_type,
-            'tags': json.loads(self.tags) if self.tags else [],
+            'tags': self.tags or [],
             'is_favorite': self.is_favorite,
             'download_count': self.download_count,
             'view_count': self.view_count,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at
         }
 
+# Case-insensitive title prefix search; text_pattern_ops lets Postgres use the index for LIKE 'prefix%'
+db.Index('ix_documents_title_lower', func.lower(Document.title).label('title_lower'),
+         postgresql_ops={'title_lower': 'text_pattern_ops'})
+
+class DocumentTag(db.Model):
+    """One row per normalized tag on a document, mirroring Document.tags for indexed lookups"""
+    __tablename__ = 'document_tags'
+    __table_args__ = (
+        db.Index('ix_document_tags_tag_client', 'tag', 'client_id', 'document_id'),
+    )
+    
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    tag = db.Column(db.String(255), primary_key=True)
+    client_id = db.Column(db.String(255), nullable=False)
+
 class ProgressMetric(db.Model):
     __tablename__ = 'progress_metrics'
+    __table_args__ = (
+        db.Index('ix_progress_metrics_client_name_recorded', 'client_id', 'metric_name', 'recorded_at'),
+        # Lets retention find expired samples without scanning the table
+        db.Index('ix_progress_metrics_recorded', 'recorded_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.String(255), db.ForeignKey('clients.id'), nullable=False)
@@ -140,6 +247,7 @@ class ProgressMetric(db.Model):
     category = db.Column(db.String(100), nullable=False)
     recorded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    @profiled('serialize')
     def to_dict(self):
         return {
             'id': self.id,
@@ -148,14 +256,712 @@ class ProgressMetric(db.Model):
             'metric_value': self.metric_value,
             'metric_type': self.metric_type,
             'category': self.category,
-            'recorded_at': self.recorded_at.isoformat() if self.recorded_at else None
+            'recorded_at': self.recorded_at
+        }
+    
+class ProgressRollupMixin:
+    """
+    Per-bucket aggregate of a client's progress metric samples, maintained
+    by timeseries.roll_up whenever samples are written.
+    """
+    resolution = None
+    
+    id = db.Column(db.Integer, primary_key=True)
+    metric_name = db.Column(db.String(255), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False)
+    value_sum = db.Column(db.Float, nullable=False)
+    min_value = db.Column(db.Float, nullable=False)
+    max_value = db.Column(db.Float, nullable=False)
+    last_value = db.Column(db.Float, nullable=False)
+    last_recorded_at = db.Column(db.DateTime, nullable=False)
+    
+    @db.declared_attr
+    def client_id(cls):
+        return db.Column(db.String(255), db.ForeignKey('clients.id'), nullable=False)
+    
+    @db.declared_attr.directive
+    def __table_args__(cls):
+        return (
+            db.UniqueConstraint('client_id', 'metric_name', 'bucket_start', name=f'uq_{cls.__tablename__}_bucket'),
+            db.Index(f'ix_{cls.__tablename__}_client_bucket', 'client_id', 'bucket_start'),
+        )
+    
+    @profiled('serialize')
+    def to_dict(self):
+        return {
+            'client_id': self.client_id,
+            'metric_name': self.metric_name,
+            'resolution': self.resolution,
+            'bucket_start': self.bucket_start,
+            'count': self.sample_count,
+            'min': self.min_value,
+            'max': self.max_value,
+            'avg': self.value_sum / self.sample_count,
+            'last': self.last_value,
+            'last_recorded_at': self.last_recorded_at
         }
 
-# Initialize database
-with app.app_context():
-    db.create_all()
+class ProgressMetricHourly(ProgressRollupMixin, db.Model):
+    __tablename__ = 'progress_metrics_hourly'
+    resolution = 'hour'
+
+class ProgressMetricDaily(ProgressRollupMixin, db.Model):
+    __tablename__ = 'progress_metrics_daily'
+    resolution = 'day'
+
+# Rollup model for each resolution get_progress can serve besides raw samples
+PROGRESS_ROLLUPS = {model.resolution: model for model in (ProgressMetricHourly, ProgressMetricDaily)}
+
+class OnboardingJob(db.Model):
+    __tablename__ = 'onboarding_jobs'
+    __table_args__ = (
+        db.Index('ix_onboarding_jobs_status_next_attempt', 'status', 'next_attempt_at'),
+        db.Index('ix_onboarding_jobs_client_id', 'client_id'),
+    )
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    client_id = db.Column(db.String(255), nullable=False)
+    client_info = db.Column(JSONColumn, nullable=False)
+    callback_url = db.Column(db.String(2048))
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    locked_by = db.Column(db.String(255))
+    last_error = db.Column(db.Text)
+    result = db.Column(JSONColumn)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'client_id': self.client_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'next_attempt_at': self.next_attempt_at if self.status == 'queued' else None,
+            'last_error': self.last_error,
+            'result': self.result,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    
+    key = db.Column(db.String(255), primary_key=True)
+    client_id = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='processing')  # processing, completed
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(JSONColumn)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class RevokedAccessToken(db.Model):
+    __tablename__ = 'revoked_access_tokens'
+    
+    token_id = db.Column(db.String(32), primary_key=True)
+    client_id = db.Column(db.String(255), nullable=False)
+    # Rows can be dropped once the token would have expired anyway
+    expires_at = db.Column(db.DateTime, nullable=False)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Track which clients, and which of their resources, each transaction touches so cached reads
+# can be invalidated and event streams notified
+def mark_client_changed(client_id, *resources):
+    """Record a write to a client's rows that bypasses the ORM unit of work; no resources means all of them"""
+    db.session.info.setdefault('changed_clients', {}).setdefault(client_id, set()).update(resources or CHANGE_RESOURCES)
+
+@db.event.listens_for(Session, 'after_flush')
+def collect_changed_clients(session, flush_context):
+    changed = session.info.setdefault('changed_clients', {})
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, Client):
+            changed.setdefault(instance.id, set()).add('client')
+        elif isinstance(instance, Reminder):
+            changed.setdefault(instance.client_id, set()).add('reminders')
+        elif isinstance(instance, Document):
+            changed.setdefault(instance.client_id, set()).add('documents')
+        elif isinstance(instance, ProgressMetric):
+            changed.setdefault(instance.client_id, set()).add('progress')
+
+@db.event.listens_for(Session, 'after_flush')
+def roll_up_new_progress_metrics(session, flush_context):
+    # Bulk inserts roll up in insert_feature_rows; this covers samples added through the ORM
+    samples = [
+        (instance.client_id, instance.metric_name, instance.recorded_at, instance.metric_value)
+        for instance in session.new if isinstance(instance, ProgressMetric)
+    ]
+    if samples:
+        roll_up(session.connection(), progress_rollup_tables(), samples)
+
+@db.event.listens_for(Session, 'after_flush')
+def sync_document_tags(session, flush_context):
+    # Bulk inserts index tags in insert_feature_rows; this covers documents written through the ORM
+    changed = [
+        instance for instance in session.new if isinstance(instance, Document)
+    ] + [
+        instance for instance in session.dirty
+        if isinstance(instance, Document) and db.inspect(instance).attrs.tags.history.has_changes()
+    ]
+    stale_ids = [instance.id for instance in changed if instance not in session.new]
+    stale_ids += [instance.id for instance in session.deleted if isinstance(instance, Document)]
+    if not changed and not stale_ids:
+        return
+    connection = session.connection()
+    if stale_ids:
+        connection.execute(db.delete(DocumentTag.__table__).where(DocumentTag.document_id.in_(stale_ids)))
+    rows = tag_rows((instance.id, instance.client_id, instance.tags) for instance in changed)
+    if rows:
+        connection.execute(insert(DocumentTag.__table__), rows)
+
+def progress_rollup_tables():
+    return {resolution: model.__table__ for resolution, model in PROGRESS_ROLLUPS.items()}
+
+@db.event.listens_for(Session, 'after_commit')
+def propagate_changed_clients(session):
+    changed = session.info.pop('changed_clients', None)
+    if not changed:
+        return
+    for client_id in changed:
+        get_response_cache().invalidate(client_id)
+    changed_at = datetime.utcnow().isoformat()
+    try:
+        get_event_broker().publish({
+            client_id: {'client_id': client_id, 'resources': sorted(resources), 'changed_at': changed_at}
+            for client_id, resources in changed.items()
+        })
+    except Exception:
+        # The write is committed; streams that miss the event catch up on their next reset
+        logger.exception("Publishing change events failed",
+                         extra={'event': 'events.publish_failed', 'clients': len(changed)})
+
+@db.event.listens_for(Session, 'after_rollback')
+def discard_changed_clients(session):
+    session.info.pop('changed_clients', None)
+
+def cached_response(endpoint):
+    """
+    Serve a client read endpoint from the response cache. Successful
+    responses are cached per client under the endpoint name and query
+    string; streamed exports and debug-profiled requests bypass the cache.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(client_id):
+            if request.args.get('stream') == 'true' or g.get('profile_debug'):
+                return view(client_id)
+            
+            # The access token authorizes the request but does not change the response
+            args = sorted((name, value) for name, value in request.args.items(multi=True) if name != 'access_token')
+            key = f"{endpoint}?{urlencode(args)}"
+            response_cache = get_response_cache()
+            cached = response_cache.get(client_id, key)
+            if cached is not None:
+                body, etag = cached
+                if etag and request.if_none_match.contains_weak(etag):
+                    response = current_app.response_class(status=304)
+                else:
+                    response = current_app.response_class(body, mimetype='application/json')
+                if etag:
+                    response.set_etag(etag)
+                return response
+            
+            response = make_response(view(client_id))
+            if response.status_code == 200:
+                response_cache.set(client_id, key, (response.get_data(), response.get_etag()[0]))
+            return response
+        return wrapper
+    return decorator
+
+def create_app(config=None):
+    """Create the Flask application; no database work happens here"""
+    app = Flask(__name__)
+    CORS(app)
+    
+    # Database configuration
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///axiom_enterprise.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'axiom-enterprise-secret-key')
+    # Previous secret keys, newest first; tokens they signed keep verifying during rotation
+    app.config['SECRET_KEY_FALLBACKS'] = [key for key in os.environ.get('SECRET_KEY_FALLBACKS', '').split(',') if key]
+    # Reuse pre-encoded template fragments when writing JSON columns
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'json_serializer': encode_json}
+    # 'lazy' migrates on the first database request; 'off' leaves schema work to `flask init-db`
+    app.config['SCHEMA_BOOTSTRAP'] = os.environ.get('SCHEMA_BOOTSTRAP', 'lazy')
+    
+    # Onboarding content, loaded once at startup
+    app.config['ONBOARDING_TEMPLATES_PATH'] = os.environ.get(
+        'ONBOARDING_TEMPLATES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'onboarding_templates.json')
+    )
+    
+    # Response cache for client read endpoints
+    app.config['RESPONSE_CACHE_ENABLED'] = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 2048))
+    app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+    
+    # Asynchronous onboarding
+    app.config['ASYNC_ONBOARDING'] = os.environ.get('ASYNC_ONBOARDING', 'false').lower() == 'true'
+    app.config['ONBOARDING_WORKERS'] = int(os.environ.get('ONBOARDING_WORKERS', 2))
+    app.config['ONBOARDING_MAX_ATTEMPTS'] = int(os.environ.get('ONBOARDING_MAX_ATTEMPTS', 5))
+    app.config['ONBOARDING_RETRY_BASE'] = float(os.environ.get('ONBOARDING_RETRY_BASE', 2))
+    app.config['ONBOARDING_RETRY_MAX'] = float(os.environ.get('ONBOARDING_RETRY_MAX', 300))
+    app.config['ONBOARDING_JOB_LEASE'] = int(os.environ.get('ONBOARDING_JOB_LEASE', 300))
+    # Hosts that job status callbacks may be sent to over https; callbacks are refused when empty
+    app.config['ONBOARDING_CALLBACK_HOSTS'] = [
+        host.strip().lower() for host in os.environ.get('ONBOARDING_CALLBACK_HOSTS', '').split(',') if host.strip()
+    ]
+    
+    # Batch payment webhook
+    app.config['BATCH_WEBHOOK_MAX_EVENTS'] = int(os.environ.get('BATCH_WEBHOOK_MAX_EVENTS', 1000))
+    app.config['BATCH_ONBOARDING_CHUNK_SIZE'] = int(os.environ.get('BATCH_ONBOARDING_CHUNK_SIZE', 250))
+    
+    # Structured logging; LOG_FORMAT=plain keeps Python's default logging setup
+    app.config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'json')
+    app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+    # e.g. "payment.received=0.1,dashboard.delivered=0.1"
+    app.config['LOG_SAMPLE_RATES'] = parse_sample_rates(os.environ.get('LOG_SAMPLE_RATES', ''))
+    app.config['LOG_REDACT_FIELDS'] = os.environ.get(
+        'LOG_REDACT_FIELDS', 'customer_email,email,access_token,authorization,password,secret,token'
+    ).split(',')
+    app.config['LOG_MAX_FIELD_LENGTH'] = int(os.environ.get('LOG_MAX_FIELD_LENGTH', 256))
+    app.config['LOG_QUEUE_SIZE'] = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    
+    # Prometheus metrics at /metrics
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    
+    # JSON encoding: 'auto' picks orjson when installed; compact output has no whitespace
+    app.config['JSON_PROVIDER'] = os.environ.get('JSON_PROVIDER', 'auto')
+    app.config['JSON_COMPACT'] = os.environ.get('JSON_COMPACT', 'true').lower() == 'true'
+    app.config['JSON_SORT_KEYS'] = os.environ.get('JSON_SORT_KEYS', 'false').lower() == 'true'
+    
+    # Response compression negotiated through Accept-Encoding
+    app.config['COMPRESSION_ENABLED'] = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    app.config['COMPRESSION_MIN_SIZE'] = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    app.config['COMPRESSION_GZIP_LEVEL'] = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    app.config['COMPRESSION_BROTLI_QUALITY'] = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+    
+    # Per-request profiling: always on, or per request with a signed debug header
+    app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    app.config['PROFILING_HEADER'] = os.environ.get('PROFILING_HEADER', 'X-Debug-Profile')
+    # Fraction of profiled requests captured with cProfile; debug header requests are always captured
+    app.config['PROFILING_SAMPLE_RATE'] = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01))
+    app.config['PROFILING_DIR'] = os.environ.get('PROFILING_DIR', 'profiles')
+    
+    # Signed access tokens for the client read endpoints
+    app.config['ACCESS_TOKEN_TTL'] = int(os.environ.get('ACCESS_TOKEN_TTL', 30 * 24 * 3600))
+    app.config['ACCESS_TOKEN_SCOPES'] = os.environ.get('ACCESS_TOKEN_SCOPES', 'read').split(',')
+    app.config['ACCESS_TOKEN_REQUIRED'] = os.environ.get('ACCESS_TOKEN_REQUIRED', 'false').lower() == 'true'
+    app.config['ACCESS_TOKEN_CACHE_SIZE'] = int(os.environ.get('ACCESS_TOKEN_CACHE_SIZE', 4096))
+    app.config['ACCESS_TOKEN_REVOCATION_REFRESH'] = int(os.environ.get('ACCESS_TOKEN_REVOCATION_REFRESH', 30))
+    
+    # Bulk progress metric ingest
+    app.config['INGEST_CHUNK_SIZE'] = int(os.environ.get('INGEST_CHUNK_SIZE', 5000))
+    app.config['INGEST_MAX_SAMPLE_BYTES'] = int(os.environ.get('INGEST_MAX_SAMPLE_BYTES', 64 * 1024))
+    # Rejected samples listed individually in the response; the count is always exact
+    app.config['INGEST_MAX_ERRORS'] = int(os.environ.get('INGEST_MAX_ERRORS', 100))
+    
+    # Due reminder scheduler; runs in every process that serves requests when enabled
+    app.config['REMINDER_SCHEDULER_ENABLED'] = os.environ.get('REMINDER_SCHEDULER_ENABLED', 'false').lower() == 'true'
+    app.config['REMINDER_SCHEDULER_INTERVAL'] = float(os.environ.get('REMINDER_SCHEDULER_INTERVAL', 1))
+    app.config['REMINDER_SCHEDULER_BATCH_SIZE'] = int(os.environ.get('REMINDER_SCHEDULER_BATCH_SIZE', 500))
+    app.config['REMINDER_SCHEDULER_LOOKAHEAD'] = int(os.environ.get('REMINDER_SCHEDULER_LOOKAHEAD', 300))
+    app.config['REMINDER_SCHEDULER_RESCAN'] = int(os.environ.get('REMINDER_SCHEDULER_RESCAN', 300))
+    # Overdue reminders older than this are not notified after downtime
+    app.config['REMINDER_SCHEDULER_CATCHUP'] = int(os.environ.get('REMINDER_SCHEDULER_CATCHUP', 24 * 3600))
+    # Due notifications are POSTed here in batches; without it they are only logged
+    app.config['REMINDER_WEBHOOK_URL'] = os.environ.get('REMINDER_WEBHOOK_URL')
+    app.config['REMINDER_BULK_MAX_IDS'] = int(os.environ.get('REMINDER_BULK_MAX_IDS', 1000))
+    
+    # Write-behind document view/download counters
+    app.config['DOCUMENT_COUNTER_FLUSH_INTERVAL'] = float(os.environ.get('DOCUMENT_COUNTER_FLUSH_INTERVAL', 5))
+    # Distinct pending (document, counter) pairs that trigger an early flush
+    app.config['DOCUMENT_COUNTER_MAX_PENDING'] = int(os.environ.get('DOCUMENT_COUNTER_MAX_PENDING', 100000))
+    
+    # Server-sent change event streams; 'auto' uses Postgres LISTEN/NOTIFY when the database is Postgres
+    app.config['EVENT_BROKER'] = os.environ.get('EVENT_BROKER', 'auto')
+    app.config['EVENT_CHANNEL'] = os.environ.get('EVENT_CHANNEL', 'client_changes')
+    # Open streams per process; each holds a server thread, so keep this below the thread count
+    app.config['EVENT_MAX_SUBSCRIBERS'] = int(os.environ.get('EVENT_MAX_SUBSCRIBERS', 24))
+    # Recent events kept per client for Last-Event-ID resume, and clients with a history
+    app.config['EVENT_HISTORY_SIZE'] = int(os.environ.get('EVENT_HISTORY_SIZE', 100))
+    app.config['EVENT_HISTORY_CLIENTS'] = int(os.environ.get('EVENT_HISTORY_CLIENTS', 10000))
+    app.config['EVENT_QUEUE_SIZE'] = int(os.environ.get('EVENT_QUEUE_SIZE', 1000))
+    app.config['EVENT_HEARTBEAT_INTERVAL'] = float(os.environ.get('EVENT_HEARTBEAT_INTERVAL', 15))
+    # Streams end after this long and the browser reconnects, resuming from its last event
+    app.config['EVENT_STREAM_MAX_SECONDS'] = int(os.environ.get('EVENT_STREAM_MAX_SECONDS', 300))
+    app.config['EVENT_RETRY_MS'] = int(os.environ.get('EVENT_RETRY_MS', 3000))
+    
+    # Progress metric retention; 0 keeps data forever. Daily rollups are always kept
+    app.config['PROGRESS_RAW_RETENTION_DAYS'] = int(os.environ.get('PROGRESS_RAW_RETENTION_DAYS', 90))
+    app.config['PROGRESS_HOURLY_RETENTION_DAYS'] = int(os.environ.get('PROGRESS_HOURLY_RETENTION_DAYS', 400))
+    app.config['PROGRESS_COMPACTION_BATCH_SIZE'] = int(os.environ.get('PROGRESS_COMPACTION_BATCH_SIZE', 5000))
+    
+    # Webhook idempotency
+    app.config['IDEMPOTENCY_WAIT'] = float(os.environ.get('IDEMPOTENCY_WAIT', 5))
+    app.config['IDEMPOTENCY_LEASE'] = int(os.environ.get('IDEMPOTENCY_LEASE', 120))
+    
+    if config:
+        app.config.update(config)
+    
+    if app.config['METRICS_ENABLED']:
+        # Time pool checkouts wherever the dialect would use a QueuePool anyway
+        database_url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        if issubclass(database_url.get_dialect().get_pool_class(database_url), QueuePool):
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**app.config['SQLALCHEMY_ENGINE_OPTIONS'], 'poolclass': TimedQueuePool}
+    
+    if app.config['LOG_FORMAT'] == 'json':
+        configure_logging(
+            level=app.config['LOG_LEVEL'],
+            sample_rates=app.config['LOG_SAMPLE_RATES'],
+            redact_fields=app.config['LOG_REDACT_FIELDS'],
+            max_field_length=app.config['LOG_MAX_FIELD_LENGTH'],
+            max_queue_size=app.config['LOG_QUEUE_SIZE']
+        )
+    
+    app.json = get_provider_class(app.config['JSON_PROVIDER'])(app)
+    db.init_app(app)
+    app.register_blueprint(api)
+    
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_profiling(engine)
+    
+    if app.config['METRICS_ENABLED']:
+        table_models = {mapper.local_table.name: mapper.class_.__name__ for mapper in db.Model.registry.mappers}
+        with app.app_context():
+            for engine in db.engines.values():
+                instrument_engine(engine, table_models)
+    
+    app.extensions['onboarding_templates'] = TemplateRegistry.load(app.config['ONBOARDING_TEMPLATES_PATH'])
+    # Any CacheBackend implementation can be swapped in here
+    if app.config['RESPONSE_CACHE_ENABLED']:
+        app.extensions['response_cache'] = LRUCacheBackend(
+            max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+            ttl=app.config['RESPONSE_CACHE_TTL']
+        )
+    else:
+        app.extensions['response_cache'] = NullCacheBackend()
+    broker_options = {
+        'history_size': app.config['EVENT_HISTORY_SIZE'],
+        'max_clients': app.config['EVENT_HISTORY_CLIENTS'],
+        'max_subscribers': app.config['EVENT_MAX_SUBSCRIBERS'],
+        'queue_size': app.config['EVENT_QUEUE_SIZE'],
+        # Commits in other workers arrive as events; their cached responses here are stale too
+        'on_deliver': app.extensions['response_cache'].invalidate
+    }
+    with app.app_context():
+        backend = app.config['EVENT_BROKER']
+        if backend == 'auto':
+            backend = 'postgres' if db.engine.dialect.name == 'postgresql' else 'local'
+        if backend == 'postgres':
+            app.extensions['event_broker'] = PostgresBroker(db.engine, channel=app.config['EVENT_CHANNEL'], **broker_options)
+        else:
+            app.extensions['event_broker'] = LocalBroker(**broker_options)
+    app.extensions['onboarding_workers'] = WorkerPool(
+        app, process_onboarding_job, concurrency=app.config['ONBOARDING_WORKERS'], name='onboarding-worker'
+    )
+    scheduler = app.extensions['reminder_scheduler'] = DueScheduler(
+        load_due_reminders, notify_due_reminders,
+        batch_size=app.config['REMINDER_SCHEDULER_BATCH_SIZE'],
+        lookahead=app.config['REMINDER_SCHEDULER_LOOKAHEAD'],
+        rescan_interval=app.config['REMINDER_SCHEDULER_RESCAN'],
+        catchup=app.config['REMINDER_SCHEDULER_CATCHUP']
+    )
+    # A single thread owns the heap
+    app.extensions['reminder_workers'] = WorkerPool(
+        app, scheduler.poll, concurrency=1, idle_interval=app.config['REMINDER_SCHEDULER_INTERVAL'],
+        name='reminder-scheduler'
+    )
+    app.extensions['document_counters'] = CounterBuffer(max_keys=app.config['DOCUMENT_COUNTER_MAX_PENDING'])
+    app.extensions['counter_flusher'] = WorkerPool(
+        app, flush_document_counters, concurrency=1, idle_interval=app.config['DOCUMENT_COUNTER_FLUSH_INTERVAL'],
+        name='counter-flusher'
+    )
+    app.extensions['access_tokens'] = TokenSigner(
+        [app.config['SECRET_KEY'], *app.config['SECRET_KEY_FALLBACKS']],
+        ttl=app.config['ACCESS_TOKEN_TTL'],
+        cache_size=app.config['ACCESS_TOKEN_CACHE_SIZE'],
+        revocation_refresh=app.config['ACCESS_TOKEN_REVOCATION_REFRESH']
+    )
+    app.extensions['schema_bootstrap'] = {'ready': False, 'lock': threading.Lock()}
+    
+    # Buffered counter increments are written before the process exits
+    atexit.register(functools.partial(flush_counters_at_exit, app))
+    
+    # Connections inherited from a preloading parent must not be shared with the child
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=functools.partial(dispose_engines, app))
+    
+    return app
+
+def flush_counters_at_exit(app):
+    app.extensions['counter_flusher'].stop(timeout=5)
+    with app.app_context():
+        flush_document_counters()
+
+def dispose_engines(app):
+    """Drop pooled connections without closing the parent's sockets"""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+def get_response_cache():
+    return current_app.extensions['response_cache']
+
+def get_onboarding_templates():
+    return current_app.extensions['onboarding_templates']
+
+def get_onboarding_workers():
+    return current_app.extensions['onboarding_workers']
+
+def get_reminder_scheduler():
+    return current_app.extensions['reminder_scheduler']
+
+def get_reminder_workers():
+    return current_app.extensions['reminder_workers']
+
+def get_document_counters():
+    return current_app.extensions['document_counters']
 
-@app.route('/webhook/payment-confirmed', methods=['POST'])
+def get_counter_flusher():
+    return current_app.extensions['counter_flusher']
+
+def get_event_broker():
+    return current_app.extensions['event_broker']
+
+def get_access_tokens():
+    return current_app.extensions['access_tokens']
+
+def require_access_token(scope):
+    """
+    Require a token for the URL's client with the given scope, passed as a
+    Bearer Authorization header or an access_token query parameter. Only
+    enforced when ACCESS_TOKEN_REQUIRED is set.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(client_id, **kwargs):
+            if current_app.config['ACCESS_TOKEN_REQUIRED']:
+                error = access_token_error(client_id, scope)
+                if error is not None:
+                    return error
+            return view(client_id, **kwargs)
+        return wrapper
+    return decorator
+
+def require_operator_token(scope):
+    """
+    Require an operator token with the given scope on an endpoint that
+    reaches across clients. Operator tokens are issued for
+    OPERATOR_CLIENT_ID (`flask issue-token '*'`); client tokens are refused.
+    Only enforced when ACCESS_TOKEN_REQUIRED is set.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            if current_app.config['ACCESS_TOKEN_REQUIRED']:
+                error = access_token_error(OPERATOR_CLIENT_ID, scope)
+                if error is not None:
+                    return error
+            return view(**kwargs)
+        return wrapper
+    return decorator
+
+def access_token_error(client_id, scope):
+    """Return the error response for a request without a valid token for client_id and scope, else None"""
+    authorization = request.headers.get('Authorization', '')
+    token = authorization[7:] if authorization.startswith('Bearer ') else request.args.get('access_token')
+    if not token:
+        return jsonify({'success': False, 'error': 'Access token required'}), 401
+    
+    access_tokens = get_access_tokens()
+    access_tokens.revoked.refresh_if_stale(load_revoked_token_ids)
+    try:
+        access_tokens.verify(token, client_id=client_id, scope=scope)
+    except InvalidToken as e:
+        return jsonify({'success': False, 'error': str(e)}), 403
+    return None
+
+def load_revoked_token_ids():
+    return db.session.scalars(
+        select(RevokedAccessToken.token_id).where(RevokedAccessToken.expires_at > datetime.utcnow())
+    ).all()
+
+@api.before_app_request
+def assign_request_id():
+    # Registered first so every later hook and helper logs with the request id
+    request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.request_id_token = request_id_var.set(request_id[:64])
+
+@api.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@api.before_app_request
+def start_profile():
+    config = current_app.config
+    token = request.headers.get(config['PROFILING_HEADER'])
+    if not config['PROFILING_ENABLED'] and not token:
+        return
+    debug = bool(token) and verify_debug_token(config['SECRET_KEY'], token)
+    if not (config['PROFILING_ENABLED'] or debug):
+        return
+    capture = debug or random.random() < config['PROFILING_SAMPLE_RATE']
+    # A debug request is asking where the time goes, so it skips the response cache
+    g.profile_debug = debug
+    g.profile_token = current_profile.set(RequestProfile(capture=capture))
+
+@api.after_app_request
+def add_server_timing(response):
+    profile = current_profile.get()
+    if profile is None:
+        return response
+    profile.stop()
+    response.headers['Server-Timing'] = profile.server_timing()
+    if profile.profiler is not None:
+        # Write the stats once the response has been sent
+        name = f"{int(time.time())}-{request.endpoint or 'unmatched'}-{request_id_var.get()}"
+        directory = current_app.config['PROFILING_DIR']
+        response.call_on_close(lambda: profile.dump(directory, name))
+    return response
+
+@api.teardown_app_request
+def reset_profile(exc):
+    token = g.pop('profile_token', None)
+    if token is not None:
+        current_profile.reset(token)
+
+@api.after_app_request
+def record_request_metrics(response):
+    if current_app.config['METRICS_ENABLED'] and 'request_started' in g:
+        # Label by URL rule, not path, to keep one series per route
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        record_request(route, request.method, response.status_code, time.perf_counter() - g.request_started)
+    return response
+
+@api.after_app_request
+def add_request_id_header(response):
+    response.headers['X-Request-ID'] = request_id_var.get()
+    return response
+
+@api.after_app_request
+def compress(response):
+    # Registered last so it runs first, before timing and metrics are recorded
+    if not current_app.config['COMPRESSION_ENABLED']:
+        return response
+    return compress_response(
+        response, request.accept_encodings,
+        min_size=current_app.config['COMPRESSION_MIN_SIZE'],
+        gzip_level=current_app.config['COMPRESSION_GZIP_LEVEL'],
+        brotli_quality=current_app.config['COMPRESSION_BROTLI_QUALITY']
+    )
+
+@api.teardown_app_request
+def reset_request_id(exc):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        request_id_var.reset(token)
+
+@api.before_app_request
+def bootstrap_schema():
+    # Health and service info never touch the database
+    if current_app.config['SCHEMA_BOOTSTRAP'] != 'lazy' or request.endpoint in ('api.health_check', 'api.root', 'api.metrics'):
+        return
+    state = current_app.extensions['schema_bootstrap']
+    if state['ready']:
+        return
+    with state['lock']:
+        if not state['ready']:
+            migrations.upgrade(db.engine, db.metadata)
+            state['ready'] = True
+
+@api.cli.command('init-db')
+def init_db_command():
+    """Create or migrate the database schema"""
+    version = migrations.upgrade(db.engine, db.metadata)
+    print(f"Database schema at version {version}")
+
+@api.cli.command('profile-token')
+@click.option('--ttl', default=900, show_default=True, help='Seconds until the token expires')
+def profile_token_command(ttl):
+    """Print a signed debug header value that enables profiling"""
+    print(f"{current_app.config['PROFILING_HEADER']}: {sign_debug_token(current_app.config['SECRET_KEY'], ttl)}")
+
+@api.cli.command('issue-token')
+@click.argument('client_id')
+@click.option('--scope', 'scopes', multiple=True, help='Scope to grant (repeatable; defaults to ACCESS_TOKEN_SCOPES)')
+@click.option('--ttl', type=int, default=None, help='Seconds until the token expires')
+def issue_token_command(client_id, scopes, ttl):
+    """Print a signed access token for a client, or an operator token for client '*'"""
+    print(get_access_tokens().issue(client_id, scopes or current_app.config['ACCESS_TOKEN_SCOPES'], ttl=ttl))
+
+@api.cli.command('revoke-token')
+@click.argument('token')
+def revoke_token_command(token):
+    """Revoke an access token in every worker within ACCESS_TOKEN_REVOCATION_REFRESH seconds"""
+    try:
+        claims = get_access_tokens().verify(token)
+    except InvalidToken as e:
+        print(f"Not revoked: {e}")
+        sys.exit(1)
+    db.session.merge(RevokedAccessToken(
+        token_id=claims.token_id, client_id=claims.client_id, expires_at=datetime.utcfromtimestamp(claims.expires_at)
+    ))
+    db.session.commit()
+    print(f"Revoked token {claims.token_id} for client {claims.client_id}")
+
+@api.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if per-client lookups fall back to full table scans"""
+    failures = check_query_plans()
+    for description in failures:
+        print(f"Full table scan: {description}")
+    if failures:
+        sys.exit(1)
+    print("All per-client lookups use an index")
+
+@api.cli.command('compact-progress')
+def compact_progress_command():
+    """Delete progress samples and hourly rollups past their retention"""
+    deleted = compact_progress_metrics()
+    print(f"Deleted {deleted['raw']} raw samples and {deleted['hour']} hourly rollups")
+
+@api.cli.command('onboarding-worker')
+def onboarding_worker_command():
+    """Run the onboarding worker pool in the foreground"""
+    get_onboarding_workers().run_forever()
+
+@api.before_app_request
+def start_onboarding_workers():
+    # Drain jobs left over from previous processes when async onboarding is the default
+    if current_app.config['ASYNC_ONBOARDING'] and not get_onboarding_workers().running:
+        get_onboarding_workers().start()
+
+@api.before_app_request
+def start_counter_flusher():
+    if not get_counter_flusher().running:
+        get_counter_flusher().start()
+
+@api.before_app_request
+def start_event_broker():
+    if not get_event_broker().running:
+        get_event_broker().start()
+
+@api.cli.command('reminder-scheduler')
+def reminder_scheduler_command():
+    """Send due reminder notifications in the foreground"""
+    get_reminder_workers().run_forever()
+
+@api.before_app_request
+def start_reminder_scheduler():
+    if current_app.config['REMINDER_SCHEDULER_ENABLED'] and not get_reminder_workers().running:
+        get_reminder_workers().start()
+
+@api.route('/webhook/payment-confirmed', methods=['POST'])
 def payment_confirmed():
     """
     Enhanced endpoint for N8N 'Generate Dashboard Access' node
@@ -163,66 +969,294 @@ def payment_confirmed():
     """
     try:
         data = request.json
-        print(f"Received payment confirmation: {data}")
+        logger.info("Received payment confirmation", extra={'event': 'payment.received', 'payload': data})
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Bad request', 'message': 'Expected a JSON object'}), 400
         
         # Extract client information from N8N/Stripe data
-        client_info = extract_client_info_from_n8n(data)
+        try:
+            client_info = extract_client_info_from_n8n(data)
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({'error': 'Bad request', 'message': str(e)}), 400
         
         # Create unique client ID
-        client_id = f"{client_info['company_name'].lower().replace(' ', '-')}-{client_info['session_id']}"
+        client_id = derive_client_id(client_info)
         
-        # Check if client already exists
-        existing_client = Client.query.get(client_id)
-        if existing_client:
-            dashboard_url = f"https://ivfstuba.manus.space/client/{client_id}"
-            access_token = generate_access_token(client_id)
-            
-            return jsonify({
-                'dashboard_url': dashboard_url,
-                'access_token': access_token,
-                'client_id': client_id,
-                'customer_email': client_info['customer_email'],
-                'client_name': client_info['company_name'],
-                'status': 'existing_client',
-                'created_at': existing_client.created_at.isoformat()
-            })
+        # Duplicate deliveries short-circuit here and replay the stored response
+        idempotency_key = webhook_idempotency_key(data, client_id)
+        record = claim_idempotency_key(idempotency_key, client_id)
+        if record is not None:
+            if record.status != 'completed':
+                response = jsonify({
+                    'error': 'Conflict',
+                    'message': 'A request for this payment is still being processed'
+                })
+                response.status_code = 409
+                response.headers['Retry-After'] = '1'
+                return response
+            response = jsonify(record.response_body)
+            response.status_code = record.response_status
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
         
-        # Create new client record with enterprise features
-        client = create_enterprise_client(client_id, client_info)
-        
-        # Initialize enterprise dashboard data
-        initialize_enterprise_features(client_id, client_info)
+        try:
+            response_data, status_code = confirm_payment(client_id, client_info, data)
+        except Exception:
+            release_idempotency_key(idempotency_key)
+            raise
+        # Replays are served to whoever repeats the payment ids, so they carry no access token
+        complete_idempotency_key(
+            idempotency_key, {key: value for key, value in response_data.items() if key != 'access_token'}, status_code
+        )
         
-        # Generate dashboard access
-        dashboard_url = f"https://ivfstuba.manus.space/client/{client_id}"
-        access_token = generate_access_token(client_id)
+        return jsonify(response_data), status_code
         
-        response_data = {
-            'dashboard_url': dashboard_url,
-            'access_token': access_token,
+    except Exception as e:
+        logger.exception("Payment confirmation failed", extra={'event': 'payment.failed'})
+        return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+def confirm_payment(client_id, client_info, data):
+    """Onboard a paid client, or report the existing one; returns (payload, status)"""
+    # Check if client already exists
+    existing_client = db.session.get(Client, client_id)
+    if existing_client:
+        return existing_client_response(existing_client, client_info), 200
+    
+    # Hand onboarding to the worker pool and let N8N poll or receive a callback
+    if current_app.config['ASYNC_ONBOARDING'] or 'respond-async' in request.headers.get('Prefer', ''):
+        callback_url = data.get('callback_url')
+        if callback_url is not None:
+            try:
+                validate_callback_url(callback_url)
+            except ValueError as e:
+                return {'error': 'Bad request', 'message': str(e)}, 400
+        job = enqueue_onboarding_job(client_id, client_info, callback_url)
+        logger.info("Queued onboarding job",
+                    extra={'event': 'onboarding.queued', 'job_id': job.id, 'client_id': client_id})
+        return {
+            'status': 'accepted',
+            'job_id': job.id,
             'client_id': client_id,
             'customer_email': client_info['customer_email'],
             'client_name': client_info['company_name'],
-            'payment_intent_id': client_info.get('payment_intent_id'),
-            'status': 'success',
-            'created_at': datetime.utcnow().isoformat(),
-            'enterprise_features': {
-                'ai_reminders': True,
-                'progress_tracking': True,
-                'document_hub': True,
-                'team_management': True
+            'status_url': url_for('api.get_onboarding_job', job_id=job.id, _external=True)
+        }, 202
+    
+    # Create client record and enterprise features in one transaction
+    try:
+        onboard_enterprise_client(client_id, client_info)
+    except IntegrityError:
+        # Lost a race with a concurrent delivery that used a different key
+        existing_client = db.session.get(Client, client_id)
+        if existing_client is None:
+            raise
+        return existing_client_response(existing_client, client_info), 200
+    
+    logger.info("Created enterprise client", extra={'event': 'onboarding.created', 'client_id': client_id})
+    return build_onboarding_response(client_id, client_info), 200
+
+@api.route('/webhook/payment-confirmed/batch', methods=['POST'])
+def payment_confirmed_batch():
+    """
+    Batch variant of the payment webhook for backfills and N8N backlog flushes.
+    Accepts a JSON array of events (or {"events": [...]}) in any format the
+    single webhook understands and returns one result per event, in order.
+    """
+    try:
+        data = request.json
+        events = data.get('events') if isinstance(data, dict) else data
+        if not isinstance(events, list):
+            return jsonify({'error': 'Bad request', 'message': 'Expected a JSON array of events'}), 400
+        max_events = current_app.config['BATCH_WEBHOOK_MAX_EVENTS']
+        if len(events) > max_events:
+            return jsonify({
+                'error': 'Payload too large',
+                'message': f'A batch may contain at most {max_events} events'
+            }), 413
+        logger.info("Received payment confirmation batch", extra={'event': 'payment.batch_received', 'events': len(events)})
+        
+        results = [None] * len(events)
+        # client_id -> (index of first event, client_info); later events for the same client are duplicates
+        pending = {}
+        duplicates = []
+        for index, event in enumerate(events):
+            try:
+                if not isinstance(event, dict):
+                    raise ValueError('Expected a JSON object')
+                client_info = extract_client_info_from_n8n(event)
+            except (ValueError, TypeError, AttributeError) as e:
+                results[index] = {'index': index, 'status_code': 400, 'error': 'Bad request', 'message': str(e)}
+                continue
+            client_id = derive_client_id(client_info)
+            if client_id in pending:
+                duplicates.append((index, pending[client_id][0]))
+            else:
+                pending[client_id] = (index, client_info)
+        
+        # One round trip finds every client that was already onboarded
+        existing = {}
+        if pending:
+            existing = {
+                row.id: row for row in db.session.execute(
+                    select(Client.id, Client.created_at).where(Client.id.in_(list(pending)))
+                )
             }
-        }
+        new_clients = []
+        for client_id, (index, client_info) in pending.items():
+            if client_id in existing:
+                results[index] = {'index': index, 'status_code': 200,
+                                  **existing_client_response(existing[client_id], client_info)}
+            else:
+                new_clients.append((client_id, client_info))
         
-        print(f"Created enterprise client: {client_id}")
-        return jsonify(response_data)
+        for client_id, outcome in onboard_enterprise_clients(new_clients).items():
+            index, client_info = pending[client_id]
+            if isinstance(outcome, Exception):
+                results[index] = {'index': index, 'status_code': 500,
+                                  'error': 'Internal server error', 'message': str(outcome)}
+            elif outcome is None:
+                results[index] = {'index': index, 'status_code': 200,
+                                  **build_onboarding_response(client_id, client_info)}
+            else:
+                results[index] = {'index': index, 'status_code': 200,
+                                  **existing_client_response(outcome, client_info)}
+        
+        for index, first_index in duplicates:
+            results[index] = {**results[first_index], 'index': index, 'duplicate_of': first_index}
+        
+        summary = {'received': len(events), 'created': 0, 'existing': 0, 'duplicates': len(duplicates),
+                   'invalid': 0, 'failed': 0}
+        for result in results:
+            if result.get('duplicate_of') is not None:
+                continue
+            if result['status_code'] == 400:
+                summary['invalid'] += 1
+            elif result['status_code'] >= 500:
+                summary['failed'] += 1
+            elif result['status'] == 'existing_client':
+                summary['existing'] += 1
+            else:
+                summary['created'] += 1
+        logger.info("Processed payment confirmation batch", extra={'event': 'payment.batch_processed', 'summary': summary})
+        
+        return jsonify({'summary': summary, 'results': results}), 200
         
     except Exception as e:
-        print(f"Error in payment_confirmed: {e}")
-        logging.error(f"Payment confirmation error: {e}")
+        logger.exception("Batch payment confirmation failed", extra={'event': 'payment.batch_failed'})
         return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
-@app.route('/api/clients/<client_id>', methods=['GET'])
+@api.route('/api/progress-metrics/ingest', methods=['POST'])
+@require_operator_token('write')
+def ingest_progress_metrics():
+    """
+    Bulk ingest progress metric samples for any number of clients from an
+    NDJSON body (application/x-ndjson) or a JSON array. The body is parsed
+    as a stream and written in chunks of INGEST_CHUNK_SIZE samples, each in
+    its own transaction. Invalid samples and samples for unknown clients
+    are rejected individually and reported by position. Needs an operator
+    token with the write scope when access tokens are enforced.
+    """
+    max_sample_bytes = current_app.config['INGEST_MAX_SAMPLE_BYTES']
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+        samples, position = iter_ndjson(request.stream, max_sample_bytes), 'line'
+    elif request.mimetype == 'application/json':
+        samples, position = iter_json_array(request.stream, max_sample_bytes), 'index'
+    else:
+        return jsonify({
+            'error': 'Unsupported media type',
+            'message': 'Send application/x-ndjson or a JSON array as application/json'
+        }), 415
+    
+    try:
+        summary, errors, malformed = ingest_progress_samples(samples, position)
+    except Exception as e:
+        logger.exception("Progress metric ingest failed", extra={'event': 'progress.ingest_failed'})
+        return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+    
+    logger.info("Ingested progress metrics", extra={'event': 'progress.ingested', **summary})
+    if malformed is not None:
+        # Samples before the syntax error were still written
+        return jsonify({'error': 'Bad request', 'message': str(malformed), 'summary': summary, 'errors': errors}), 400
+    return jsonify({'summary': summary, 'errors': errors}), 200
+
+@api.route('/api/reminders/due', methods=['GET'])
+@require_operator_token('read')
+def get_due_reminders():
+    """
+    Get active reminders across all clients that fall due in a from/to time
+    range (to defaults to now), earliest first, optionally for one client_id.
+    Paginated with limit/cursor, or streamed in full with stream=true.
+    Needs an operator token when access tokens are enforced.
+    """
+    try:
+        query = Reminder.query.filter(Reminder.status == 'active')
+        if request.args.get('from'):
+            query = query.filter(Reminder.due_date >= parse_datetime_arg('from'))
+        to = parse_datetime_arg('to') if request.args.get('to') else datetime.utcnow()
+        query = query.filter(Reminder.due_date < to)
+        if request.args.get('client_id'):
+            query = query.filter(Reminder.client_id == request.args['client_id'])
+        
+        return list_response(query, [Reminder.due_date, Reminder.id], Reminder.to_dict)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/reminders/status', methods=['POST'])
+@require_operator_token('write')
+def update_reminder_statuses():
+    """
+    Move many reminders to a new status in one statement, e.g.
+    {"reminder_ids": [1, 2, 3], "status": "completed"}. Reports which ids
+    changed, which already had the status and which do not exist. Needs an
+    operator token with the write scope when access tokens are enforced.
+    """
+    try:
+        data = request.json
+        reminder_ids = data.get('reminder_ids') if isinstance(data, dict) else None
+        status = data.get('status') if isinstance(data, dict) else None
+        if status not in REMINDER_STATUSES:
+            return jsonify({'error': 'Bad request', 'message': f"status must be one of: {', '.join(REMINDER_STATUSES)}"}), 400
+        if not isinstance(reminder_ids, list) or not all(
+                isinstance(reminder_id, int) and not isinstance(reminder_id, bool) for reminder_id in reminder_ids):
+            return jsonify({'error': 'Bad request', 'message': 'reminder_ids must be a list of integers'}), 400
+        max_ids = current_app.config['REMINDER_BULK_MAX_IDS']
+        if len(reminder_ids) > max_ids:
+            return jsonify({
+                'error': 'Payload too large',
+                'message': f'At most {max_ids} reminders can be updated at once'
+            }), 413
+        
+        result = transition_reminders(set(reminder_ids), status)
+        logger.info("Updated reminder statuses", extra={
+            'event': 'reminders.status_updated', 'status': status,
+            **{outcome: len(ids) for outcome, ids in result.items()}
+        })
+        return jsonify({'status': status, **result}), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Reminder status update failed", extra={'event': 'reminders.status_update_failed'})
+        return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+@api.route('/api/onboarding-jobs/<job_id>', methods=['GET'])
+def get_onboarding_job(job_id):
+    """Get the status of an asynchronous onboarding job"""
+    try:
+        job = db.session.get(OnboardingJob, job_id)
+        if not job:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'data': job.to_dict()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/clients/<client_id>', methods=['GET'])
+@require_access_token('read')
+@cached_response('client')
 def get_client(client_id):
     """Get client data by ID"""
     try:
@@ -237,50 +1271,243 @@ def get_client(client_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/clients/<client_id>/reminders', methods=['GET'])
+@api.route('/api/clients/<client_id>/reminders', methods=['GET'])
+@require_access_token('read')
+@cached_response('reminders')
 def get_reminders(client_id):
-    """Get all reminders for a client"""
+    """
+    Get reminders for a client, filtered by status and priority.
+    Paginated with limit/cursor, or streamed in full with stream=true.
+    """
     try:
-        reminders = Reminder.query.filter_by(client_id=client_id).all()
-        return jsonify({
-            'success': True,
-            'data': [reminder.to_dict() for reminder in reminders]
-        })
+        query = Reminder.query.filter_by(client_id=client_id)
+        if request.args.get('status'):
+            query = query.filter(Reminder.status == request.args['status'])
+        if request.args.get('priority'):
+            query = query.filter(Reminder.priority == request.args['priority'])
+        
+        return list_response(query, [Reminder.id], Reminder.to_dict)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/clients/<client_id>/documents', methods=['GET'])
+@api.route('/api/clients/<client_id>/documents', methods=['GET'])
+@require_access_token('read')
+@cached_response('documents')
 def get_documents(client_id):
-    """Get all documents for a client"""
+    """
+    Get documents for a client, filtered by category and favorites.
+    Paginated with limit/cursor, or streamed in full with stream=true.
+    """
+    try:
+        query = Document.query.filter_by(client_id=client_id)
+        if request.args.get('category'):
+            query = query.filter(Document.category == request.args['category'])
+        if request.args.get('favorites') == 'true':
+            query = query.filter(Document.is_favorite.is_(True))
+        
+        return list_response(query, [Document.id], Document.to_dict)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/clients/<client_id>/documents/search', methods=['GET'])
+@require_access_token('read')
+@cached_response('document_search')
+def search_client_documents(client_id):
+    """
+    Search a client's documents by tag, category, favorites and title prefix
+    (see document_search_query). Paginated with limit/cursor, or streamed in
+    full with stream=true.
+    """
+    try:
+        return list_response(document_search_query([client_id]), [Document.id], Document.to_dict)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/documents/search', methods=['GET'])
+@require_operator_token('read')
+def search_documents():
+    """
+    Search documents across the clients given as repeated client_id
+    parameters, or across all clients when there are none. Takes the same
+    filters and pagination as the per-client search. Needs an operator
+    token when access tokens are enforced.
+    """
     try:
-        documents = Document.query.filter_by(client_id=client_id).all()
+        client_ids = request.args.getlist('client_id')
+        if len(client_ids) > MAX_PAGE_SIZE:
+            raise ValueError(f'At most {MAX_PAGE_SIZE} client_id values can be searched at once')
+        return list_response(document_search_query(client_ids or None), [Document.id], Document.to_dict)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/clients/<client_id>/documents/<int:document_id>/<any(view, download):event>', methods=['POST'])
+@require_access_token('read')
+def record_document_event(client_id, document_id, event):
+    """
+    Count a document view or download. The increment is buffered in this
+    process and written in the next batched counter flush.
+    """
+    counters = get_document_counters()
+    if counters.increment((client_id, document_id), f'{event}_count'):
+        flush_document_counters()
+    return jsonify({'success': True}), 202
+
+@api.route('/api/clients/<client_id>/documents/counts', methods=['GET'])
+@require_access_token('read')
+def get_document_counts(client_id):
+    """
+    Approximate live view and download counts for a client's documents:
+    the stored counts plus increments this process has not flushed yet.
+    """
+    try:
+        counters = get_document_counters()
+        rows = db.session.execute(
+            select(Document.id, Document.view_count, Document.download_count)
+            .where(Document.client_id == client_id)
+            .order_by(Document.id)
+        ).all()
         return jsonify({
             'success': True,
-            'data': [doc.to_dict() for doc in documents]
+            'data': [{
+                'id': row.id,
+                'view_count': (row.view_count or 0) + counters.pending((client_id, row.id), 'view_count'),
+                'download_count': (row.download_count or 0) + counters.pending((client_id, row.id), 'download_count')
+            } for row in rows]
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/clients/<client_id>/progress', methods=['GET'])
+@api.route('/api/clients/<client_id>/progress', methods=['GET'])
+@require_access_token('read')
+@cached_response('progress')
 def get_progress(client_id):
-    """Get progress metrics for a client"""
+    """
+    Get progress metrics for a client in time order, filtered by metric_name
+    and a from/to time range. resolution=raw (the default) returns every
+    sample; hour or day returns one rollup per metric and bucket with the
+    count, min, max, avg and last value, covering the buckets that overlap
+    the range.
+    Paginated with limit/cursor, or streamed in full with stream=true.
+    """
     try:
-        metrics = ProgressMetric.query.filter_by(client_id=client_id).all()
-        return jsonify({
+        resolution = request.args.get('resolution', 'raw')
+        if resolution == 'raw':
+            model, timestamp = ProgressMetric, ProgressMetric.recorded_at
+        elif resolution in PROGRESS_ROLLUPS:
+            model = PROGRESS_ROLLUPS[resolution]
+            timestamp = model.bucket_start
+        else:
+            raise ValueError(f"resolution must be one of: raw, {', '.join(PROGRESS_ROLLUPS)}")
+        
+        query = model.query.filter_by(client_id=client_id)
+        if request.args.get('metric_name'):
+            query = query.filter(model.metric_name == request.args['metric_name'])
+        if request.args.get('from'):
+            start = parse_datetime_arg('from')
+            if resolution != 'raw':
+                start = bucket_start(start, resolution)
+            query = query.filter(timestamp >= start)
+        if request.args.get('to'):
+            query = query.filter(timestamp < parse_datetime_arg('to'))
+        
+        return list_response(query, [timestamp, model.id], model.to_dict)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/clients/<client_id>/dashboard', methods=['GET'])
+@require_access_token('read')
+@cached_response('dashboard')
+def get_dashboard(client_id):
+    """Get client data with reminders, documents and progress in one response"""
+    try:
+        etag = dashboard_etag(client_id)
+        if etag is None:
+            return jsonify({'success': False, 'error': 'Client not found'}), 404
+        
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        
+        client = Client.query.options(
+            selectinload(Client.reminders),
+            selectinload(Client.documents),
+            selectinload(Client.progress_metrics)
+        ).filter_by(id=client_id).one_or_none()
+        if not client:
+            return jsonify({'success': False, 'error': 'Client not found'}), 404
+        
+        response = jsonify({
             'success': True,
-            'data': [metric.to_dict() for metric in metrics]
+            'data': {
+                'client': client.to_dict(),
+                'reminders': [reminder.to_dict() for reminder in client.reminders],
+                'documents': [doc.to_dict() for doc in client.documents],
+                'progress': [metric.to_dict() for metric in client.progress_metrics]
+            }
         })
+        response.set_etag(etag)
+        return response
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/webhook/dashboard-delivered', methods=['POST'])
+@api.route('/api/clients/<client_id>/events', methods=['GET'])
+@require_access_token('read')
+def client_events(client_id):
+    """
+    Stream change notifications for a client as server-sent events. Each
+    'change' event lists the resources that changed (client, reminders,
+    documents, progress) so the dashboard refetches only those. A
+    reconnecting stream resumes after the Last-Event-ID header or the
+    last_event_id parameter; a 'reset' event means events were missed and
+    everything should be refetched. Streams end after
+    EVENT_STREAM_MAX_SECONDS and the browser reconnects.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        subscription = get_event_broker().subscribe(client_id, last_event_id)
+    except TooManySubscribers as e:
+        retry_after = str(max(1, current_app.config['EVENT_RETRY_MS'] // 1000))
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': retry_after}
+    
+    config = current_app.config
+    
+    # Runs after the request context is gone, holding no database connection while it waits
+    def generate():
+        try:
+            yield f"retry: {config['EVENT_RETRY_MS']}\n\n"
+            deadline = time.monotonic() + config['EVENT_STREAM_MAX_SECONDS']
+            while (remaining := deadline - time.monotonic()) > 0:
+                events = subscription.get(min(config['EVENT_HEARTBEAT_INTERVAL'], remaining))
+                # A comment line keeps proxies from timing out and detects closed connections
+                yield ''.join(encode_event(event) for event in events) if events else ': keepalive\n\n'
+        finally:
+            subscription.close()
+    
+    response = current_app.response_class(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@api.route('/webhook/dashboard-delivered', methods=['POST'])
 def dashboard_delivered():
     """
     Enhanced endpoint for N8N 'Confirm Delivery' node
     """
     try:
         data = request.json
-        print(f"Dashboard delivery confirmed: {data}")
+        logger.info("Dashboard delivery confirmed", extra={'event': 'dashboard.delivered', 'payload': data})
         
         response_data = {
             'status': 'success',
@@ -294,10 +1521,10 @@ def dashboard_delivered():
         return jsonify(response_data)
         
     except Exception as e:
-        print(f"Error in dashboard_delivered: {e}")
+        logger.exception("Dashboard delivery confirmation failed", extra={'event': 'dashboard.delivery_failed'})
         return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
-@app.route('/health', methods=['GET'])
+@api.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
@@ -305,10 +1532,23 @@ def health_check():
         'service': 'AXIOM Enterprise Integration Service',
         'timestamp': datetime.utcnow().isoformat(),
         'version': '2.0.0',
-        'features': ['client_management', 'ai_reminders', 'progress_tracking', 'document_hub']
+        'features': ['client_management', 'ai_reminders', 'progress_tracking', 'document_hub'],
+        'response_cache': get_response_cache().stats(),
+        'access_tokens': {**get_access_tokens().cache_info(), 'revoked': len(get_access_tokens().revoked)},
+        'document_counters': get_document_counters().stats(),
+        'event_streams': get_event_broker().stats(),
+        'logging': get_log_pipeline().stats() if get_log_pipeline() else None
     })
 
-@app.route('/', methods=['GET'])
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for every worker process"""
+    if not current_app.config['METRICS_ENABLED']:
+        return jsonify({'error': 'Not found', 'message': 'Metrics are disabled'}), 404
+    body, content_type = render_metrics()
+    return current_app.response_class(body, content_type=content_type)
+
+@api.route('/', methods=['GET'])
 def root():
     """Root endpoint with service information"""
     return jsonify({
@@ -317,13 +1557,267 @@ def root():
         'version': '2.0.0',
         'endpoints': {
             'payment_confirmed': '/webhook/payment-confirmed',
+            'payment_confirmed_batch': '/webhook/payment-confirmed/batch',
             'dashboard_delivered': '/webhook/dashboard-delivered',
             'client_data': '/api/clients/<client_id>',
-            'health': '/health'
+            'client_dashboard': '/api/clients/<client_id>/dashboard',
+            'client_events': '/api/clients/<client_id>/events',
+            'onboarding_job': '/api/onboarding-jobs/<job_id>',
+            'document_search': '/api/documents/search',
+            'due_reminders': '/api/reminders/due',
+            'reminder_status': '/api/reminders/status',
+            'progress_ingest': '/api/progress-metrics/ingest',
+            'health': '/health',
+            'metrics': '/metrics'
         },
         'description': 'Enterprise service for AXIOM dashboard delivery with full client management'
     })
 
+def document_search_query(client_ids):
+    """
+    Build a document query from the search parameters, limited to client_ids
+    unless it is None:
+    
+    - tag (repeatable): documents carrying every given tag
+    - any_tag (repeatable): documents carrying at least one of the tags
+    - category, favorites=true: as on the document list
+    - q: case-insensitive title prefix
+    
+    Tags are matched through the document_tags index after normalization.
+    """
+    query = Document.query
+    tag_scope = []
+    if client_ids is not None:
+        query = query.filter(Document.client_id.in_(client_ids))
+        tag_scope.append(DocumentTag.client_id.in_(client_ids))
+    
+    # Rare tags drive the query from their short list of document ids; common
+    # tags are probed per document instead, since walking documents in id
+    # order meets enough matches to fill a page long before the list of
+    # every tagged document could be built
+    frequencies = {tag: tag_frequency([tag], tag_scope) for tag in normalize_tags(request.args.getlist('tag'))}
+    tags = sorted(frequencies, key=frequencies.get)
+    for index, tag in enumerate(tags):
+        if index == 0 and frequencies[tag] < DENSE_TAG_THRESHOLD:
+            query = query.filter(Document.id.in_(
+                select(DocumentTag.document_id).where(DocumentTag.tag == tag, *tag_scope)
+            ))
+        else:
+            query = query.filter(select(DocumentTag.document_id).where(
+                DocumentTag.document_id == Document.id, DocumentTag.tag == tag
+            ).exists())
+    any_tags = normalize_tags(request.args.getlist('any_tag'))
+    if any_tags and not tags and tag_frequency(any_tags, tag_scope) < DENSE_TAG_THRESHOLD:
+        query = query.filter(Document.id.in_(
+            select(DocumentTag.document_id).where(DocumentTag.tag.in_(any_tags), *tag_scope)
+        ))
+    elif any_tags:
+        query = query.filter(select(DocumentTag.document_id).where(
+            DocumentTag.document_id == Document.id, DocumentTag.tag.in_(any_tags)
+        ).exists())
+    if request.args.get('category'):
+        query = query.filter(Document.category == request.args['category'])
+    if request.args.get('favorites') == 'true':
+        query = query.filter(Document.is_favorite.is_(True))
+    if request.args.get('q'):
+        query = query.filter(title_prefix_condition(request.args['q']))
+    return query
+
+def tag_frequency(tags, tag_scope):
+    """Number of documents carrying any of the tags, counted no further than DENSE_TAG_THRESHOLD"""
+    return db.session.scalar(select(func.count()).select_from(
+        select(DocumentTag.document_id).where(DocumentTag.tag.in_(tags), *tag_scope)
+        .limit(DENSE_TAG_THRESHOLD).subquery()
+    ))
+
+def title_prefix_condition(prefix):
+    """Case-insensitive title prefix match that can use ix_documents_title_lower"""
+    title = func.lower(Document.title)
+    if db.engine.dialect.name == 'postgresql':
+        pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return title.like(func.lower(pattern), escape='\\')
+    # SQLite uses an expression index for range comparisons but not for LIKE
+    return and_(title >= func.lower(prefix), title < func.lower(prefix) + '\U0010ffff')
+
+def dashboard_etag(client_id):
+    """
+    Compute a strong ETag for a client dashboard from row timestamps and
+    document counters in a single query, so unchanged dashboards are answered without loading rows.
+    Returns None if the client does not exist.
+    """
+    columns = [Client.updated_at, Client.created_at]
+    for model, timestamp in ((Reminder, Reminder.updated_at),
+                             (Document, Document.updated_at),
+                             (ProgressMetric, ProgressMetric.recorded_at)):
+        for aggregate in (func.count(model.id), func.max(model.id), func.max(timestamp)):
+            columns.append(
+                select(aggregate).where(model.client_id == Client.id).scalar_subquery()
+            )
+    # Counter flushes change these without touching updated_at
+    for counter in (Document.view_count, Document.download_count):
+        columns.append(select(func.sum(counter)).where(Document.client_id == Client.id).scalar_subquery())
+    
+    row = db.session.execute(select(*columns).where(Client.id == client_id)).first()
+    if row is None:
+        return None
+    
+    fingerprint = '|'.join(value.isoformat() if isinstance(value, datetime) else str(value) for value in row)
+    return hashlib.sha1(f"{client_id}|{fingerprint}".encode()).hexdigest()
+
+def check_query_plans():
+    """
+    Explain the per-client lookups issued by the read endpoints and return
+    a description of each one the planner executes as a full table scan.
+    """
+    lookups = [
+        Reminder.query.filter_by(client_id='plan-check'),
+        Reminder.query.filter_by(client_id='plan-check', status='active').order_by(Reminder.due_date),
+        Reminder.query.filter(Reminder.status == 'active', Reminder.due_date < datetime(2000, 1, 1))
+            .order_by(Reminder.due_date, Reminder.id),
+        Document.query.filter_by(client_id='plan-check'),
+        DocumentTag.query.filter_by(tag='plan-check'),
+        Document.query.filter(title_prefix_condition('plan-check')),
+        ProgressMetric.query.filter_by(client_id='plan-check'),
+        ProgressMetric.query.filter_by(client_id='plan-check', metric_name='Implementation Progress')
+            .order_by(ProgressMetric.recorded_at),
+        *(model.query.filter_by(client_id='plan-check').order_by(model.bucket_start)
+          for model in PROGRESS_ROLLUPS.values())
+    ]
+    
+    failures = []
+    dialect = db.engine.dialect
+    for query in lookups:
+        compiled = query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True})
+        table = query.statement.get_final_froms()[0].name
+        with db.engine.begin() as connection:
+            if dialect.name == 'postgresql':
+                # Small tables are cheaper to scan, so only fail if no index is usable at all
+                connection.execute(db.text('SET LOCAL enable_seqscan = off'))
+                plan = connection.exec_driver_sql(f"EXPLAIN {compiled}").scalars().all()
+                full_scan = any(f"Seq Scan on {table}" in line for line in plan)
+            else:
+                plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").all()
+                full_scan = any(row[-1] == f"SCAN {table}" for row in plan)
+        if full_scan:
+            failures.append(str(compiled).replace('\n', ' '))
+    
+    return failures
+
+def compact_progress_metrics(now=None):
+    """
+    Apply the progress retention policy. Raw samples older than
+    PROGRESS_RAW_RETENTION_DAYS and hourly rollups older than
+    PROGRESS_HOURLY_RETENTION_DAYS are deleted oldest first, one transaction
+    per PROGRESS_COMPACTION_BATCH_SIZE rows, so the rollups keep serving the
+    history. Returns the number of rows deleted per table.
+    """
+    now = now or datetime.utcnow()
+    batch_size = current_app.config['PROGRESS_COMPACTION_BATCH_SIZE']
+    policies = (
+        ('raw', ProgressMetric, ProgressMetric.recorded_at, current_app.config['PROGRESS_RAW_RETENTION_DAYS']),
+        ('hour', ProgressMetricHourly, ProgressMetricHourly.bucket_start,
+         current_app.config['PROGRESS_HOURLY_RETENTION_DAYS'])
+    )
+    deleted = {}
+    for name, model, timestamp, retention_days in policies:
+        deleted[name] = 0
+        if retention_days <= 0:
+            continue
+        cutoff = now - timedelta(days=retention_days)
+        while True:
+            batch = db.session.execute(
+                select(model.id, model.client_id).where(timestamp < cutoff).order_by(timestamp).limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            db.session.execute(db.delete(model).where(model.id.in_([row.id for row in batch])))
+            for client_id in {row.client_id for row in batch}:
+                mark_client_changed(client_id, 'progress')
+            db.session.commit()
+            deleted[name] += len(batch)
+    logger.info("Compacted progress metrics", extra={'event': 'progress.compacted', **deleted})
+    return deleted
+
+def list_response(query, key_columns, serialize):
+    """
+    Build the response for a per-client list query. Results are ordered by
+    key_columns, which must be unique together, and paginated by keyset:
+    the opaque 'next' cursor encodes the key of the last row returned.
+    With stream=true the whole result is streamed as a JSON array instead.
+    """
+    query = query.order_by(*key_columns)
+    if request.args.get('stream') == 'true':
+        return stream_json_array(query, serialize)
+    
+    limit = parse_limit()
+    cursor = request.args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, key_columns)
+        if len(key_columns) == 1:
+            query = query.filter(key_columns[0] > values[0])
+        else:
+            query = query.filter(tuple_(*key_columns) > tuple_(*values))
+    
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in key_columns])
+    
+    return jsonify({
+        'success': True,
+        'data': [serialize(row) for row in rows],
+        'next': next_cursor
+    })
+
+def stream_json_array(query, serialize):
+    """Stream query results as a JSON array, fetching rows in batches"""
+    def generate():
+        yield '['
+        for index, row in enumerate(query.yield_per(EXPORT_BATCH_SIZE)):
+            yield (',' if index else '') + current_app.json.dumps(serialize(row))
+        yield ']'
+    
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
+def parse_limit():
+    """Parse the page size from the request, bounded by MAX_PAGE_SIZE"""
+    limit = request.args.get('limit')
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return limit
+
+def parse_datetime_arg(name):
+    """Parse an ISO 8601 datetime query parameter"""
+    try:
+        return datetime.fromisoformat(request.args[name])
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO 8601 datetime')
+
+def encode_cursor(values):
+    """Encode a row's sort key as an opaque pagination cursor"""
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, key_columns):
+    """Decode a pagination cursor back into sort key values"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(key_columns):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, db.DateTime) else value
+            for value, column in zip(values, key_columns)
+        ]
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
 def extract_client_info_from_n8n(data):
     """Extract client information from N8N data"""
     # Handle both old format and new format
@@ -357,212 +1851,655 @@ def extract_client_info_from_n8n(data):
         'payment_intent_id': payment_intent_id
     }
 
-def create_enterprise_client(client_id, client_info):
-    """Create a new enterprise client record"""
-    business_context = generate_business_context(client_info)
-    current_challenges = generate_challenges(client_info)
-    recommended_solutions = generate_solutions(client_info)
-    mentor = assign_mentor(client_info['industry'])
+def derive_client_id(client_info):
+    """Deterministic client id for a payment, so redeliveries map to the same client"""
+    return f"{client_info['company_name'].lower().replace(' ', '-')}-{client_info['session_id']}"
+
+def existing_client_response(client, client_info):
+    """
+    Build the dashboard access payload for a client that was already
+    onboarded. Anyone who can rebuild a client's id can reach this, so it
+    carries no access token.
+    """
+    return {
+        'dashboard_url': f"https://ivfstuba.manus.space/client/{client.id}",
+        'client_id': client.id,
+        'customer_email': client_info['customer_email'],
+        'client_name': client_info['company_name'],
+        'status': 'existing_client',
+        'created_at': client.created_at.isoformat()
+    }
+
+def webhook_idempotency_key(data, client_id):
+    """
+    Derive the idempotency key for a payment webhook: an explicit
+    Idempotency-Key header, then the Stripe event or session id, then the
+    deterministic client id.
+    """
+    if request.headers.get('Idempotency-Key'):
+        return f"header:{request.headers['Idempotency-Key']}"
+    if data.get('event_id'):
+        return f"stripe-event:{data['event_id']}"
+    stripe_data = data.get('stripe_data')
+    if isinstance(stripe_data, dict) and stripe_data.get('id'):
+        return f"stripe-session:{stripe_data['id']}"
+    return f"client:{client_id}"
+
+def claim_idempotency_key(key, client_id):
+    """
+    Atomically claim an idempotency key with INSERT ... ON CONFLICT DO NOTHING.
+    Returns None when this request owns the key and should do the work.
+    Otherwise waits up to IDEMPOTENCY_WAIT seconds for the owner to finish
+    and returns its record, completed or still processing. Keys left in
+    processing for longer than IDEMPOTENCY_LEASE are taken over.
+    """
+    dialect_insert = postgresql_insert if db.engine.dialect.name == 'postgresql' else sqlite_insert
+    deadline = time.monotonic() + current_app.config['IDEMPOTENCY_WAIT']
     
-    client = Client(
-        id=client_id,
-        company_name=client_info['company_name'],
-        industry=client_info['industry'],
-        complexity_score=client_info['complexity_score'],
-        session_id=client_info['session_id'],
-        customer_email=client_info['customer_email'],
-        payment_intent_id=client_info.get('payment_intent_id'),
-        mentor_name=mentor['name'],
-        mentor_title=mentor['title'],
-        ai_confidence=calculate_ai_confidence(client_info['complexity_score']),
-        processing_time=calculate_processing_time(client_info['complexity_score']),
-        solutions_count=len(recommended_solutions),
-        business_context=json.dumps(business_context),
-        current_challenges=json.dumps(current_challenges),
-        recommended_solutions=json.dumps(recommended_solutions)
+    while True:
+        now = datetime.utcnow()
+        inserted = db.session.execute(
+            dialect_insert(IdempotencyKey)
+            .values(key=key, client_id=client_id, status='processing', created_at=now, updated_at=now)
+            .on_conflict_do_nothing(index_elements=['key'])
+        ).rowcount
+        db.session.commit()
+        if inserted:
+            return None
+        
+        record = db.session.get(IdempotencyKey, key, populate_existing=True)
+        if record is None:
+            # The owner failed and released the key; try to claim it again
+            continue
+        if record.status == 'completed':
+            return record
+        
+        stale_before = now - timedelta(seconds=current_app.config['IDEMPOTENCY_LEASE'])
+        taken_over = db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key,
+                   IdempotencyKey.status == 'processing',
+                   IdempotencyKey.updated_at < stale_before)
+            .values(updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if taken_over:
+            return None
+        
+        if time.monotonic() >= deadline:
+            return record
+        time.sleep(0.05)
+
+def complete_idempotency_key(key, response_body, response_status):
+    """Store the response for an owned idempotency key so duplicates can replay it"""
+    db.session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == key)
+        .values(status='completed', response_body=response_body, response_status=response_status,
+                updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
     )
-    
-    db.session.add(client)
     db.session.commit()
-    return client
 
-def initialize_enterprise_features(client_id, client_info):
-    """Initialize enterprise features for new client"""
-    create_ai_reminders(client_id, client_info)
-    create_client_documents(client_id, client_info)
-    create_progress_baseline(client_id, client_info)
+def release_idempotency_key(key):
+    """Give up an owned idempotency key after a failure so a retry can claim it"""
+    db.session.rollback()
+    db.session.execute(
+        db.delete(IdempotencyKey)
+        .where(IdempotencyKey.key == key, IdempotencyKey.status == 'processing')
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
 
-def create_ai_reminders(client_id, client_info):
-    """Create AI-powered reminders"""
-    complexity = client_info['complexity_score']
-    industry = client_info['industry']
-    
-    reminders_data = [
-        {
-            'title': 'Strategic Assessment Deep Dive',
-            'description': f'Given your complexity score of {complexity}, we recommend a comprehensive strategic assessment within the first week.',
-            'priority': 'high',
-            'category': 'Strategic Planning',
-            'due_date': datetime.now() + timedelta(days=7)
-        },
-        {
-            'title': 'AI Analysis Update',
-            'description': 'Review latest AI-generated insights on operational efficiency improvements.',
-            'priority': 'medium',
-            'category': 'AI Insights',
-            'due_date': datetime.now() + timedelta(days=14)
-        },
-        {
-            'title': 'Team Alignment Session',
-            'description': 'Schedule cross-functional alignment meeting for strategic initiatives.',
-            'priority': 'medium',
-            'category': 'Team Management',
-            'due_date': datetime.now() + timedelta(days=21)
+def build_onboarding_response(client_id, client_info):
+    """Build the dashboard access payload, with a new access token, for a client this request created"""
+    return {
+        'dashboard_url': f"https://ivfstuba.manus.space/client/{client_id}",
+        'access_token': generate_access_token(client_id),
+        'client_id': client_id,
+        'customer_email': client_info['customer_email'],
+        'client_name': client_info['company_name'],
+        'payment_intent_id': client_info.get('payment_intent_id'),
+        'status': 'success',
+        'created_at': datetime.utcnow().isoformat(),
+        'enterprise_features': {
+            'ai_reminders': True,
+            'progress_tracking': True,
+            'document_hub': True,
+            'team_management': True
         }
-    ]
-    
-    for reminder_data in reminders_data:
-        reminder = Reminder(client_id=client_id, **reminder_data)
-        db.session.add(reminder)
+    }
+
+def enqueue_onboarding_job(client_id, client_info, callback_url=None):
+    """
+    Persist an onboarding job for the worker pool. A job that is still
+    queued or running for the same client is returned instead of a new one.
+    """
+    job = OnboardingJob.query.filter(
+        OnboardingJob.client_id == client_id,
+        OnboardingJob.status.in_(('queued', 'running'))
+    ).first()
+    if job is None:
+        job = OnboardingJob(
+            client_id=client_id,
+            client_info=client_info,
+            callback_url=callback_url,
+            max_attempts=current_app.config['ONBOARDING_MAX_ATTEMPTS']
+        )
+        db.session.add(job)
+        db.session.commit()
     
-    db.session.commit()
+    get_onboarding_workers().start()
+    return job
 
-def create_client_documents(client_id, client_info):
-    """Create initial document set"""
-    company_name = client_info['company_name']
-    industry = client_info['industry']
-    
-    documents_data = [
-        {
-            'title': f'{company_name} Strategic Implementation Roadmap',
-            'description': f'Customized strategic roadmap for {company_name}',
-            'category': 'Strategic',
-            'file_type': 'pdf',
-            'tags': json.dumps(['roadmap', 'strategy', company_name.lower()])
-        },
-        {
-            'title': f'{company_name} Complexity Assessment Report',
-            'description': f'Detailed complexity analysis for {company_name}',
-            'category': 'Analysis',
-            'file_type': 'pdf',
-            'tags': json.dumps(['analysis', 'complexity', company_name.lower()])
-        },
-        {
-            'title': f'{industry} Industry Best Practices',
-            'description': f'Industry-specific best practices for {industry}',
-            'category': 'Operational',
-            'file_type': 'pdf',
-            'tags': json.dumps(['best-practices', industry.lower()])
-        }
-    ]
+def claim_onboarding_job():
+    """
+    Atomically claim the next due job, including running jobs whose worker
+    lease expired. The conditional UPDATE makes the claim safe across
+    threads and processes on both Postgres and SQLite.
+    """
+    now = datetime.utcnow()
+    lease_expired = now - timedelta(seconds=current_app.config['ONBOARDING_JOB_LEASE'])
+    claimable = or_(
+        and_(OnboardingJob.status == 'queued', OnboardingJob.next_attempt_at <= now),
+        and_(OnboardingJob.status == 'running', OnboardingJob.locked_at < lease_expired)
+    )
     
-    for doc_data in documents_data:
-        document = Document(client_id=client_id, **doc_data)
-        db.session.add(document)
+    candidates = db.session.execute(
+        select(OnboardingJob.id).where(claimable).order_by(OnboardingJob.next_attempt_at).limit(10)
+    ).scalars().all()
+    for job_id in candidates:
+        claimed = db.session.execute(
+            update(OnboardingJob)
+            .where(OnboardingJob.id == job_id, claimable)
+            .values(status='running', locked_at=now, locked_by=WORKER_ID, attempts=OnboardingJob.attempts + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(OnboardingJob, job_id)
     
-    db.session.commit()
+    return None
 
-def create_progress_baseline(client_id, client_info):
-    """Create baseline progress metrics"""
-    complexity = client_info['complexity_score']
-    initial_progress = max(0, 100 - complexity)
-    
-    metrics_data = [
-        {'metric_name': 'Implementation Progress', 'metric_value': initial_progress, 'metric_type': 'percentage', 'category': 'Overall'},
-        {'metric_name': 'Strategic Initiatives', 'metric_value': 0, 'metric_type': 'count', 'category': 'Strategy'},
-        {'metric_name': 'Team Engagement', 'metric_value': 95 - (complexity * 0.5), 'metric_type': 'percentage', 'category': 'Team'},
-        {'metric_name': 'Risk Mitigation', 'metric_value': 25, 'metric_type': 'percentage', 'category': 'Risk'}
-    ]
+def flush_document_counters():
+    """
+    Write buffered document counter increments with one executemany of
+    UPDATE documents SET count = count + n. Increments are put back if the
+    write fails. updated_at is kept, since a view does not edit the
+    document, but the clients are marked changed so cached responses and
+    dashboard ETags pick up the new counts. Returns False so the flusher
+    thread waits a full interval between flushes.
+    """
+    counters = get_document_counters()
+    pending = counters.drain()
+    if not pending:
+        return False
     
-    for metric_data in metrics_data:
-        metric = ProgressMetric(client_id=client_id, **metric_data)
-        db.session.add(metric)
+    rows = {}
+    for ((client_id, document_id), column), amount in pending.items():
+        row = rows.setdefault((client_id, document_id), {
+            'counter_client_id': client_id, 'counter_document_id': document_id, 'views': 0, 'downloads': 0
+        })
+        row['views' if column == 'view_count' else 'downloads'] += amount
     
-    db.session.commit()
+    documents = Document.__table__
+    statement = (
+        update(documents)
+        .where(documents.c.id == bindparam('counter_document_id'),
+               documents.c.client_id == bindparam('counter_client_id'))
+        .values(view_count=func.coalesce(documents.c.view_count, 0) + bindparam('views'),
+                download_count=func.coalesce(documents.c.download_count, 0) + bindparam('downloads'),
+                updated_at=documents.c.updated_at)
+    )
+    try:
+        db.session.execute(statement, list(rows.values()))
+        for client_id in {client_id for client_id, _ in rows}:
+            mark_client_changed(client_id, 'documents')
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        counters.restore(pending)
+        logger.exception("Document counter flush failed",
+                         extra={'event': 'counters.flush_failed', 'documents': len(rows)})
+        return False
+    counters.record_flush(len(rows))
+    return False
 
-def generate_business_context(client_info):
-    """Generate business context"""
+def transition_reminders(reminder_ids, status):
+    """
+    Set the status of many reminders with a single UPDATE ... RETURNING.
+    Returns sorted id lists under 'updated', 'unchanged' and 'not_found'.
+    """
+    updated = db.session.execute(
+        update(Reminder)
+        .where(Reminder.id.in_(reminder_ids), Reminder.status != status)
+        .values(status=status)
+        .returning(Reminder.id, Reminder.client_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    for client_id in {row.client_id for row in updated}:
+        mark_client_changed(client_id, 'reminders')
+    remaining = reminder_ids - {row.id for row in updated}
+    unchanged = set()
+    if remaining:
+        unchanged = set(db.session.scalars(select(Reminder.id).where(Reminder.id.in_(remaining))))
+    db.session.commit()
     return {
-        "company_overview": f"{client_info['company_name']} is a dynamic organization in the {client_info['industry']} sector, committed to strategic excellence.",
-        "market_position": f"Established player in the {client_info['industry']} market with growth opportunities.",
-        "strategic_focus": "Accelerating organizational effectiveness through strategic implementation."
+        'updated': sorted(row.id for row in updated),
+        'unchanged': sorted(unchanged),
+        'not_found': sorted(remaining - unchanged)
     }
 
-def generate_challenges(client_info):
-    """Generate challenges based on complexity and industry"""
-    complexity = client_info['complexity_score']
-    industry = client_info['industry']
-    
-    challenges = []
+def load_due_reminders(after, before, limit):
+    """(due_date, id) of unnotified active reminders after a key and due before a time, in key order"""
+    after_due, after_id = after
+    return db.session.execute(
+        select(Reminder.due_date, Reminder.id)
+        .where(
+            Reminder.status == 'active',
+            Reminder.notified_at.is_(None),
+            Reminder.due_date < before,
+            or_(Reminder.due_date > after_due, and_(Reminder.due_date == after_due, Reminder.id > after_id))
+        )
+        .order_by(Reminder.due_date, Reminder.id)
+        .limit(limit)
+    ).all()
+
+def notify_due_reminders(reminder_ids, now):
+    """
+    Claim due reminders and send their notifications. The conditional
+    UPDATE claims each reminder once across threads and processes; those
+    already notified, rescheduled or no longer active are skipped. Delivery
+    is at most once: a failed webhook is logged, not retried.
+    """
+    claimed = db.session.execute(
+        update(Reminder)
+        .where(
+            Reminder.id.in_(reminder_ids),
+            Reminder.status == 'active',
+            Reminder.notified_at.is_(None),
+            Reminder.due_date <= now
+        )
+        # Keep updated_at: notifying does not change what the API returns
+        .values(notified_at=now, updated_at=Reminder.updated_at)
+        .returning(Reminder.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.session.commit()
+    if not claimed:
+        return
     
-    if complexity > 40:
-        challenges.append({
-            "id": 1,
-            "title": "High Complexity Operations",
-            "description": "Managing complex operational processes requiring strategic optimization."
+    reminders = Reminder.query.filter(Reminder.id.in_(claimed)).order_by(Reminder.due_date, Reminder.id).all()
+    for reminder in reminders:
+        logger.info("Reminder due", extra={
+            'event': 'reminder.due', 'reminder_id': reminder.id, 'client_id': reminder.client_id
         })
+    url = current_app.config['REMINDER_WEBHOOK_URL']
+    if not url:
+        return
+    body = current_app.json.dumps({'event': 'reminders.due', 'reminders': [r.to_dict() for r in reminders]})
+    callback = urllib.request.Request(
+        url, data=body.encode(), headers={'Content-Type': 'application/json'}, method='POST'
+    )
+    try:
+        with urllib.request.urlopen(callback, timeout=10):
+            pass
+    except Exception as e:
+        logger.warning("Reminder notification failed",
+                       extra={'event': 'reminder.notification_failed', 'reminders': len(reminders), 'error': str(e)})
+
+def process_onboarding_job():
+    """Run one due onboarding job; returns False when there was nothing to do"""
+    job = claim_onboarding_job()
+    if job is None:
+        return False
     
-    if industry == 'Technology':
-        challenges.append({
-            "id": 2,
-            "title": "Rapid Technology Evolution",
-            "description": "Keeping pace with rapidly evolving technology landscape."
-        })
-    elif industry == 'Manufacturing':
-        challenges.append({
-            "id": 2,
-            "title": "Supply Chain Optimization",
-            "description": "Optimizing complex supply chain operations for efficiency."
-        })
+    # Job log lines carry the job id where request lines carry the request id
+    token = request_id_var.set(f"job:{job.id}")
+    try:
+        return run_onboarding_job(job)
+    finally:
+        request_id_var.reset(token)
+
+def run_onboarding_job(job):
+    """Onboard the client for a claimed job and record the outcome"""
+    job_id = job.id
+    try:
+        client = db.session.get(Client, job.client_id)
+        if client is None:
+            onboard_enterprise_client(job.client_id, job.client_info)
+            # Anyone holding the job id can read the result; the token only goes to the callback
+            job.result = {
+                key: value for key, value in build_onboarding_response(job.client_id, job.client_info).items()
+                if key != 'access_token'
+            }
+        else:
+            job.result = existing_client_response(client, job.client_info)
+        job.status = 'succeeded'
+        job.last_error = None
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(OnboardingJob, job_id)
+        logger.warning("Onboarding job attempt failed", exc_info=True,
+                       extra={'event': 'onboarding.job_failed', 'job_id': job_id, 'attempts': job.attempts})
+        job.last_error = str(e)
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+        else:
+            job.status = 'queued'
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_delay(
+                job.attempts, current_app.config['ONBOARDING_RETRY_BASE'], current_app.config['ONBOARDING_RETRY_MAX']
+            ))
+        db.session.commit()
     
-    challenges.append({
-        "id": 3,
-        "title": "Strategic Implementation Scaling",
-        "description": "Scaling strategic initiatives across the organization effectively."
-    })
+    if job.status in ('succeeded', 'failed') and job.callback_url:
+        send_job_callback(job)
+    return True
+
+def validate_callback_url(url):
+    """Raise ValueError unless url is an https URL on a host in ONBOARDING_CALLBACK_HOSTS"""
+    if not isinstance(url, str):
+        raise ValueError('callback_url must be a string')
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or '').lower()
+        parts.port
+    except ValueError:
+        raise ValueError('callback_url is not a valid URL')
+    if parts.scheme != 'https' or parts.username or parts.password:
+        raise ValueError('callback_url must be an https URL without credentials')
+    if host not in current_app.config['ONBOARDING_CALLBACK_HOSTS']:
+        raise ValueError(f'callback_url host {host!r} is not an allowed callback host')
+
+class NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    # A redirect could carry the job's access token to a host that is not allowed
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+callback_opener = urllib.request.build_opener(NoRedirectHandler)
+
+def send_job_callback(job):
+    """
+    POST the final job status to the callback URL supplied with the webhook,
+    with an access token when the job created the client
+    """
+    try:
+        # The allowlist may have changed since the job was queued
+        validate_callback_url(job.callback_url)
+        payload = job.to_dict()
+        if job.status == 'succeeded' and job.result.get('status') == 'success':
+            payload['result'] = {**job.result, 'access_token': generate_access_token(job.client_id)}
+        body = current_app.json.dumps(payload).encode()
+        callback = urllib.request.Request(
+            job.callback_url, data=body, headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        with callback_opener.open(callback, timeout=10):
+            pass
+    except Exception as e:
+        logger.warning("Onboarding job callback failed",
+                       extra={'event': 'onboarding.callback_failed', 'job_id': job.id, 'error': str(e)})
+
+def onboard_enterprise_client(client_id, client_info):
+    """
+    Create a client and its enterprise features as a single unit of work.
+    All rows are built up front, children are written with bulk multi-row
+    inserts and the transaction is committed once.
+    """
+    with timed_stage('build_rows'):
+        client = create_enterprise_client(client_id, client_info)
+        features = initialize_enterprise_features(client_id, client_info)
+    
+    try:
+        with timed_stage('create_enterprise_client'):
+            db.session.add(client)
+            mark_client_changed(client_id)
+            # Children reference the client row, so it must reach the database first
+            db.session.flush()
+        insert_onboarding_features(features)
+        with timed_stage('commit'):
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
     
-    return challenges
+    return client
+
+def onboard_enterprise_clients(new_clients):
+    """
+    Onboard many clients with bulk inserts, one transaction per chunk of
+    BATCH_ONBOARDING_CHUNK_SIZE clients. Client rows are inserted with
+    ON CONFLICT DO NOTHING ... RETURNING, and children are written only for
+    the clients this call actually created, so a concurrent delivery for the
+    same payment cannot duplicate features.
+    
+    Returns {client_id: outcome} where outcome is None for a created client,
+    the existing (id, created_at) row when another request won the race, or
+    the exception that failed the client's chunk.
+    """
+    dialect_insert = postgresql_insert if db.engine.dialect.name == 'postgresql' else sqlite_insert
+    chunk_size = current_app.config['BATCH_ONBOARDING_CHUNK_SIZE']
+    outcomes = {}
+    
+    for start in range(0, len(new_clients), chunk_size):
+        chunk = new_clients[start:start + chunk_size]
+        try:
+            with timed_stage('build_rows'):
+                client_rows = [enterprise_client_values(client_id, client_info) for client_id, client_info in chunk]
+            with timed_stage('create_enterprise_client'):
+                inserted = set(db.session.scalars(
+                    dialect_insert(Client).on_conflict_do_nothing(index_elements=['id']).returning(Client.id),
+                    client_rows
+                ))
+            
+            feature_rows = {}
+            with timed_stage('build_rows'):
+                for client_id, client_info in chunk:
+                    if client_id not in inserted:
+                        continue
+                    mark_client_changed(client_id)
+                    for model, rows in initialize_enterprise_features(client_id, client_info).items():
+                        feature_rows.setdefault(model, []).extend(rows)
+            insert_onboarding_features(feature_rows)
+            with timed_stage('commit'):
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Batch onboarding chunk failed",
+                             extra={'event': 'onboarding.batch_chunk_failed', 'clients': len(chunk)})
+            outcomes.update((client_id, e) for client_id, _ in chunk)
+            continue
+        
+        lost = [client_id for client_id, _ in chunk if client_id not in inserted]
+        if lost:
+            existing = {
+                row.id: row for row in db.session.execute(
+                    select(Client.id, Client.created_at).where(Client.id.in_(lost))
+                )
+            }
+            outcomes.update((client_id, existing[client_id]) for client_id in lost)
+        outcomes.update((client_id, None) for client_id in inserted)
+    
+    return outcomes
+
+def insert_feature_rows(model, rows):
+    """
+    Bulk insert enterprise feature rows in the current transaction, keeping
+    the derived tables in step: document tags are indexed in document_tags,
+    and progress metric samples are stamped here rather than by the column
+    default so the same timestamps can be merged into the hourly and daily
+    rollups.
+    """
+    if not rows:
+        return
+    if model is Document:
+        # Tag rows need the generated ids, returned in parameter order
+        document_ids = db.session.scalars(insert(Document).returning(Document.id, sort_by_parameter_order=True), rows)
+        tags = tag_rows(
+            (document_id, row['client_id'], row.get('tags')) for document_id, row in zip(document_ids, rows)
+        )
+        if tags:
+            db.session.execute(insert(DocumentTag), tags)
+        return
+    if model is ProgressMetric:
+        now = datetime.utcnow()
+        rows = [row if row.get('recorded_at') else {**row, 'recorded_at': now} for row in rows]
+    db.session.execute(insert(model), rows)
+    if model is ProgressMetric:
+        roll_up_progress_rows(rows)
+
+def ingest_progress_samples(samples, position):
+    """
+    Validate and write (position, sample) pairs from a streaming parser.
+    Returns (summary, errors, malformed): accepted/rejected counts, up to
+    INGEST_MAX_ERRORS rejected positions with reasons, and the MalformedBody
+    error that ended the stream early, if any.
+    """
+    chunk_size = current_app.config['INGEST_CHUNK_SIZE']
+    max_errors = current_app.config['INGEST_MAX_ERRORS']
+    summary = {'received': 0, 'accepted': 0, 'rejected': 0}
+    errors = []
+    known_clients = set()
+    chunk = []
+    
+    def reject(where, message):
+        summary['rejected'] += 1
+        if len(errors) < max_errors:
+            errors.append({position: where, 'message': message})
+    
+    def flush():
+        unknown = {row['client_id'] for _, row in chunk} - known_clients
+        if unknown:
+            known_clients.update(db.session.scalars(select(Client.id).where(Client.id.in_(unknown))))
+        rows = []
+        for where, row in chunk:
+            if row['client_id'] in known_clients:
+                rows.append(row)
+            else:
+                reject(where, f"Unknown client_id: {row['client_id']}")
+        chunk.clear()
+        if not rows:
+            return
+        try:
+            write_progress_samples(rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        summary['accepted'] += len(rows)
+    
+    now = datetime.utcnow()
+    malformed = None
+    try:
+        for where, sample in samples:
+            summary['received'] += 1
+            try:
+                if isinstance(sample, InvalidSample):
+                    raise sample
+                chunk.append((where, validate_sample(sample, now)))
+            except InvalidSample as e:
+                reject(where, str(e))
+                continue
+            if len(chunk) >= chunk_size:
+                flush()
+    except MalformedBody as e:
+        malformed = e
+    flush()
+    return summary, errors, malformed
+
+def write_progress_samples(rows):
+    """Write validated progress samples and their rollups in the current transaction"""
+    for client_id in {row['client_id'] for row in rows}:
+        mark_client_changed(client_id, 'progress')
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        copy_rows(connection, ProgressMetric.__table__, rows)
+        roll_up_progress_rows(rows)
+    else:
+        insert_feature_rows(ProgressMetric, rows)
+
+def roll_up_progress_rows(rows):
+    samples = [(row['client_id'], row['metric_name'], row['recorded_at'], row['metric_value']) for row in rows]
+    roll_up(db.session.connection(), progress_rollup_tables(), samples)
+
+def create_enterprise_client(client_id, client_info):
+    """Build a new enterprise client record"""
+    return Client(**enterprise_client_values(client_id, client_info))
+
+def enterprise_client_values(client_id, client_info):
+    """Build the column values for a new enterprise client"""
+    business_context = generate_business_context(client_info)
+    current_challenges = generate_challenges(client_info)
+    recommended_solutions = generate_solutions(client_info)
+    mentor = assign_mentor(client_info['industry'])
+    
+    return {
+        'id': client_id,
+        'company_name': client_info['company_name'],
+        'industry': client_info['industry'],
+        'complexity_score': client_info['complexity_score'],
+        'session_id': client_info['session_id'],
+        'customer_email': client_info['customer_email'],
+        'payment_intent_id': client_info.get('payment_intent_id'),
+        'mentor_name': mentor['name'],
+        'mentor_title': mentor['title'],
+        'ai_confidence': calculate_ai_confidence(client_info['complexity_score']),
+        'processing_time': calculate_processing_time(client_info['complexity_score']),
+        'solutions_count': len(recommended_solutions),
+        'business_context': business_context,
+        'current_challenges': current_challenges,
+        'recommended_solutions': recommended_solutions
+    }
+
+def initialize_enterprise_features(client_id, client_info):
+    """Build enterprise feature rows for a new client, keyed by model"""
+    return {
+        Reminder: create_ai_reminders(client_id, client_info),
+        Document: create_client_documents(client_id, client_info),
+        ProgressMetric: create_progress_baseline(client_id, client_info)
+    }
+
+# Onboarding stage that times the insert of each feature model's rows
+FEATURE_STAGES = {
+    Reminder: 'create_ai_reminders',
+    Document: 'create_client_documents',
+    ProgressMetric: 'create_progress_baseline'
+}
+
+def insert_onboarding_features(features):
+    """Insert built feature rows, timing each model's insert as its onboarding stage"""
+    for model, rows in features.items():
+        with timed_stage(FEATURE_STAGES[model]):
+            insert_feature_rows(model, rows)
+
+def create_ai_reminders(client_id, client_info):
+    """Build AI-powered reminder rows"""
+    return get_onboarding_templates().reminders(client_info['complexity_score'], datetime.utcnow(), client_id=client_id)
+
+def create_client_documents(client_id, client_info):
+    """Build initial document rows"""
+    return get_onboarding_templates().documents(client_info['company_name'], client_info['industry'], client_id=client_id)
+
+def create_progress_baseline(client_id, client_info):
+    """Build baseline progress metric rows"""
+    return get_onboarding_templates().progress_baseline(client_info['complexity_score'], client_id=client_id)
+
+def generate_business_context(client_info):
+    """Generate business context"""
+    return get_onboarding_templates().business_context(client_info['company_name'], client_info['industry'])
+
+def generate_challenges(client_info):
+    """Generate challenges based on complexity and industry"""
+    return get_onboarding_templates().challenges(client_info['industry'], client_info['complexity_score'])
 
 def generate_solutions(client_info):
     """Generate solutions based on assessment"""
-    complexity = client_info['complexity_score']
-    
-    return [
-        {
-            "id": 1,
-            "title": "Strategic Excellence Framework",
-            "description": "Comprehensive framework for managing strategic initiatives",
-            "complexity_reduction": f"{min(40, complexity)}%",
-            "implementation_time": "3-4 months",
-            "roi_estimate": "250-350%"
-        },
-        {
-            "id": 2,
-            "title": "Operational Optimization Platform",
-            "description": "Integrated platform for streamlining operations",
-            "complexity_reduction": f"{min(30, complexity * 0.7)}%",
-            "implementation_time": "2-3 months",
-            "roi_estimate": "180-250%"
-        },
-        {
-            "id": 3,
-            "title": "AI-Powered Analytics Suite",
-            "description": "Advanced analytics for data-driven decision making",
-            "complexity_reduction": f"{min(25, complexity * 0.6)}%",
-            "implementation_time": "4-6 months",
-            "roi_estimate": "200-300%"
-        }
-    ]
+    return get_onboarding_templates().solutions(client_info['complexity_score'])
 
 def assign_mentor(industry):
     """Assign mentor based on industry"""
-    mentors = {
-        'Technology': {'name': 'Alex Chen', 'title': 'Technology Innovation Advisor'},
-        'Manufacturing': {'name': 'Sarah Johnson', 'title': 'Manufacturing Excellence Advisor'},
-        'Healthcare': {'name': 'Dr. Michael Roberts', 'title': 'Healthcare Strategy Advisor'},
-        'Finance': {'name': 'David Williams', 'title': 'Financial Services Advisor'}
-    }
-    return mentors.get(industry, {'name': 'Alex Thompson', 'title': 'Strategic Implementation Advisor'})
+    return get_onboarding_templates().mentor(industry)
 
 def calculate_ai_confidence(complexity_score):
     """Calculate AI confidence based on complexity"""
@@ -578,8 +2515,10 @@ def calculate_processing_time(complexity_score):
         return "3m"
 
 def generate_access_token(client_id):
-    """Generate secure access token"""
-    return f"axiom_{client_id}_{uuid.uuid4().hex[:16]}"
+    """Generate a signed access token for the client's read endpoints"""
+    return get_access_tokens().issue(client_id, current_app.config['ACCESS_TOKEN_SCOPES'])
+
+app = create_app()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,82 @@
+"""
+Batch payment webhook throughput benchmark.
+
+Delivers N fresh payment events either one request at a time through
+/webhook/payment-confirmed or in a single /webhook/payment-confirmed/batch
+call, and reports events per second for each batch size.
+
+    python benchmarks/bench_batch_webhook.py --sizes 10 100 1000
+    python benchmarks/bench_batch_webhook.py --database-url postgresql://localhost/axiom_bench
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INDUSTRIES = ['Technology', 'Manufacturing', 'Healthcare', 'Finance', 'Retail']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help='events per run')
+    parser.add_argument('--database-url', default=None,
+                        help='database to run against (defaults to a temporary SQLite file)')
+    return parser.parse_args()
+
+
+def make_events(count):
+    events = []
+    for index in range(count):
+        events.append({
+            'stripe_data': {
+                'id': f"cs_bench_{uuid.uuid4().hex[:12]}",
+                'customer_email': f'bench{index}@example.com',
+                'customer_details': {'name': f'Batch Bench {index}'},
+                'metadata': {'industry': INDUSTRIES[index % len(INDUSTRIES)], 'complexity_score': str(20 + index % 60)}
+            }
+        })
+    return events
+
+
+def run_single(client, events):
+    start = time.perf_counter()
+    for event in events:
+        response = client.post('/webhook/payment-confirmed', json=event)
+        assert response.status_code == 200, response.json
+    return time.perf_counter() - start
+
+
+def run_batch(client, events):
+    start = time.perf_counter()
+    response = client.post('/webhook/payment-confirmed/batch', json=events)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.json
+    assert response.json['summary']['created'] == len(events), response.json['summary']
+    return elapsed
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    import app as app_module
+
+    client = app_module.app.test_client()
+    client.post('/webhook/payment-confirmed/batch', json=make_events(5))  # bootstrap schema, warm caches
+
+    print(f"{'events':>7} {'single':>12} {'batch':>12} {'speedup':>8}")
+    for size in args.sizes:
+        single = run_single(client, make_events(size))
+        batch = run_batch(client, make_events(size))
+        print(f"{size:>7} {size / single:>9.0f}/s {size / batch:>9.0f}/s {single / batch:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
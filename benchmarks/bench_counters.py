@@ -0,0 +1,112 @@
+"""
+Document counter increment throughput benchmark.
+
+Records document views from concurrent threads, either with a
+read-modify-write UPDATE and commit per view (the naive approach) or through
+the write-behind counter buffer, which is flushed once at the end. Reports
+increments per second for each concurrency level and checks that no
+buffered increment is lost.
+
+    python benchmarks/bench_counters.py --threads 1 4 16 --increments 2000
+    python benchmarks/bench_counters.py --database-url postgresql://localhost/axiom_bench
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16], help='concurrency levels')
+    parser.add_argument('--increments', type=int, default=2000, help='views recorded per thread')
+    parser.add_argument('--documents', type=int, default=10, help='documents the views are spread across')
+    parser.add_argument('--database-url', default=None,
+                        help='database to run against (defaults to a temporary SQLite file)')
+    return parser.parse_args()
+
+
+def run_threads(app_module, threads, increments, record):
+    def worker(seed):
+        rng = random.Random(seed)
+        with app_module.app.app_context():
+            for _ in range(increments):
+                record(rng)
+
+    pool = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def total_views(app_module, documents):
+    db, Document = app_module.db, app_module.Document
+    with app_module.app.app_context():
+        return db.session.scalar(
+            db.select(db.func.sum(Document.view_count)).where(Document.id.in_([doc_id for _, doc_id in documents]))
+        ) or 0
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ.setdefault('LOG_FORMAT', 'plain')
+
+    import app as app_module
+    db, Document = app_module.db, app_module.Document
+
+    client = app_module.app.test_client()
+    events = [{
+        'stripe_data': {
+            'id': f'cs_counter_{index}',
+            'customer_email': f'counter{index}@example.com',
+            'customer_details': {'name': f'Counter Bench {index}'},
+            'metadata': {'industry': 'Technology', 'complexity_score': '40'}
+        }
+    } for index in range(args.documents)]
+    client.post('/webhook/payment-confirmed/batch', json=events)
+    with app_module.app.app_context():
+        documents = [tuple(row) for row in db.session.execute(
+            db.select(Document.client_id, Document.id).order_by(Document.id).limit(args.documents)
+        )]
+
+    def naive(rng):
+        client_id, document_id = rng.choice(documents)
+        document = db.session.get(Document, document_id)
+        document.view_count = (document.view_count or 0) + 1
+        db.session.commit()
+
+    def buffered(rng):
+        app_module.get_document_counters().increment(rng.choice(documents), 'view_count')
+
+    print(f"{'threads':>7} {'naive':>12} {'buffered':>12} {'speedup':>8}")
+    for threads in args.threads:
+        naive_elapsed = run_threads(app_module, threads, args.increments, naive)
+
+        # Read-modify-write can lose updates under concurrency, so only the buffered total is checked
+        expected = total_views(app_module, documents) + threads * args.increments
+        start = time.perf_counter()
+        run_threads(app_module, threads, args.increments, buffered)
+        with app_module.app.app_context():
+            app_module.flush_document_counters()
+        buffered_elapsed = time.perf_counter() - start
+        assert total_views(app_module, documents) == expected
+
+        count = threads * args.increments
+        print(f"{threads:>7} {count / naive_elapsed:>10.0f}/s {count / buffered_elapsed:>10.0f}/s "
+              f"{naive_elapsed / buffered_elapsed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
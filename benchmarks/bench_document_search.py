@@ -0,0 +1,126 @@
+"""
+Document search latency benchmark.
+
+Seeds clients and a large document set with tags drawn from a skewed
+vocabulary, then times /api/documents/search and the per-client search for
+tag AND/OR queries, category and favorite filters, title prefixes and
+cursor pagination. Reports p50 and p95 milliseconds per query.
+
+    python benchmarks/bench_document_search.py --documents 300000
+    python benchmarks/bench_document_search.py --database-url postgresql://localhost/axiom_bench
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ['Strategic Planning', 'AI Insights', 'Team Management', 'Operations', 'Finance']
+WORDS = ['roadmap', 'quarterly', 'analysis', 'strategy', 'review', 'plan', 'budget', 'report', 'summary',
+         'forecast', 'playbook', 'audit', 'charter', 'brief', 'proposal', 'retrospective']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--documents', type=int, default=300000, help='documents to seed')
+    parser.add_argument('--clients', type=int, default=3000, help='clients the documents belong to')
+    parser.add_argument('--tags', type=int, default=500, help='size of the tag vocabulary')
+    parser.add_argument('--repeat', type=int, default=50, help='timed runs per query')
+    parser.add_argument('--database-url', default=None,
+                        help='database to run against (defaults to a temporary SQLite file)')
+    return parser.parse_args()
+
+
+def seed(app_module, args, rng):
+    """Insert clients and documents directly; returns the client ids"""
+    from sqlalchemy import insert
+
+    client_ids = [f'search-bench-{index}' for index in range(args.clients)]
+    # Zipf-like weights: a few tags are common, most are rare
+    vocabulary = [f'tag-{index}' for index in range(args.tags)]
+    weights = [1 / (rank + 1) for rank in range(args.tags)]
+    with app_module.app.app_context():
+        app_module.migrations.upgrade(app_module.db.engine, app_module.db.metadata)
+        app_module.db.session.execute(insert(app_module.Client), [{
+            'id': client_id, 'company_name': client_id, 'industry': 'Technology', 'complexity_score': 40,
+            'session_id': client_id, 'mentor_name': 'Bench', 'mentor_title': 'Bench', 'customer_email': 'b@example.com'
+        } for client_id in client_ids])
+        batch = []
+        for index in range(args.documents):
+            batch.append({
+                'client_id': client_ids[index % args.clients],
+                'title': f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {index}",
+                'description': 'Benchmark document',
+                'category': rng.choice(CATEGORIES),
+                'file_type': 'pdf',
+                'tags': list({*rng.choices(vocabulary, weights, k=rng.randint(1, 5))}),
+                'is_favorite': rng.random() < 0.05
+            })
+            if len(batch) == 10000:
+                app_module.insert_feature_rows(app_module.Document, batch)
+                batch = []
+        app_module.insert_feature_rows(app_module.Document, batch)
+        app_module.db.session.commit()
+    return client_ids
+
+
+def timed(client, path, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.json
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.95) - 1] * 1000, response.json
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ.setdefault('LOG_FORMAT', 'plain')
+    # Every run must reach the database
+    os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+
+    import app as app_module
+
+    rng = random.Random(1)
+    start = time.perf_counter()
+    client_ids = seed(app_module, args, rng)
+    print(f"seeded {args.documents} documents for {args.clients} clients in {time.perf_counter() - start:.1f}s")
+
+    client = app_module.app.test_client()
+    one = client_ids[0]
+    some = [('client_id', client_id) for client_id in client_ids[:50]]
+    queries = {
+        'client: all documents': f'/api/clients/{one}/documents/search',
+        'client: tag AND': f'/api/clients/{one}/documents/search?tag=tag-0&tag=tag-1',
+        'client: title prefix': f'/api/clients/{one}/documents/search?q=road',
+        'all: common tag': '/api/documents/search?tag=tag-0',
+        'all: rare tag': f'/api/documents/search?tag=tag-{args.tags - 1}',
+        'all: tag AND': '/api/documents/search?tag=tag-0&tag=tag-1',
+        'all: tag OR': '/api/documents/search?any_tag=tag-3&any_tag=tag-4&any_tag=tag-5',
+        'all: rare tag + favorites': f'/api/documents/search?tag=tag-{args.tags // 2}&favorites=true',
+        'all: title prefix': '/api/documents/search?q=retro',
+        'all: category + favorites': '/api/documents/search?category=Finance&favorites=true',
+        '50 clients: tag OR': '/api/documents/search?' + urlencode(some + [('any_tag', 'tag-2'), ('any_tag', 'tag-9')]),
+    }
+
+    print(f"{'query':<28} {'p50 ms':>8} {'p95 ms':>8} {'rows':>6}")
+    for name, path in queries.items():
+        p50, p95, body = timed(client, path, args.repeat)
+        print(f"{name:<28} {p50:>8.2f} {p95:>8.2f} {len(body['data']):>6}")
+        if body.get('next'):
+            p50, p95, body = timed(client, f"{path}{'&' if '?' in path else '?'}cursor={body['next']}", args.repeat)
+            print(f"{name + ' (page 2)':<28} {p50:>8.2f} {p95:>8.2f} {len(body['data']):>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Change event stream benchmark.
+
+Opens N concurrent /api/clients/<id>/events streams for one client, commits
+reminder status changes for it and measures how long each change takes to
+reach every stream. For comparison it times the dashboard's poll, one GET
+of each client read endpoint, which every open tab repeats on every poll
+interval whether or not anything changed.
+
+    python benchmarks/bench_events.py --streams 1 10 20 --writes 200
+    python benchmarks/bench_events.py --database-url postgresql://localhost/axiom_bench
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+POLLED_ENDPOINTS = ['', '/reminders', '/documents', '/progress']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--streams', type=int, nargs='+', default=[1, 10, 20], help='concurrent streams')
+    parser.add_argument('--writes', type=int, default=200, help='committed changes per run')
+    parser.add_argument('--database-url', default=None,
+                        help='database to run against (defaults to a temporary SQLite file)')
+    return parser.parse_args()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)] * 1000
+
+
+def read_stream(client, path, received, ready, done):
+    response = client.get(path, buffered=False)
+    ready.release()
+    try:
+        for chunk in response.response:
+            now = time.perf_counter()
+            for frame in chunk.decode().split('\n\n'):
+                if 'event: change' in frame:
+                    received.append(now)
+            if done.is_set():
+                break
+    finally:
+        response.close()
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ.setdefault('LOG_FORMAT', 'plain')
+    # Polls must reach the database, as they do for every tab after a change
+    os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+    os.environ['EVENT_MAX_SUBSCRIBERS'] = str(max(args.streams))
+    os.environ['EVENT_HEARTBEAT_INTERVAL'] = '0.5'
+
+    import app as app_module
+
+    client = app_module.app.test_client()
+    response = client.post('/webhook/payment-confirmed', json={
+        'stripe_data': {
+            'id': 'cs_events_bench',
+            'customer_email': 'events@example.com',
+            'customer_details': {'name': 'Events Bench'},
+            'metadata': {'industry': 'Technology', 'complexity_score': '40'}
+        }
+    })
+    client_id = response.json['client_id']
+    with app_module.app.app_context():
+        reminder_ids = {reminder.id for reminder in app_module.Reminder.query.filter_by(client_id=client_id)}
+
+    latencies = []
+    for _ in range(50):
+        start = time.perf_counter()
+        for endpoint in POLLED_ENDPOINTS:
+            assert client.get(f'/api/clients/{client_id}{endpoint}').status_code == 200
+        latencies.append(time.perf_counter() - start)
+    print(f"one poll of {len(POLLED_ENDPOINTS)} endpoints: p50 {percentile(latencies, 0.5):.2f} ms, "
+          f"p95 {percentile(latencies, 0.95):.2f} ms")
+
+    print(f"{'streams':>7} {'commit p50':>11} {'deliver p50':>12} {'deliver p95':>12} {'delivered':>10}")
+    for streams in args.streams:
+        received = [[] for _ in range(streams)]
+        ready, done = threading.Semaphore(0), threading.Event()
+        readers = [
+            threading.Thread(target=read_stream, daemon=True,
+                             args=(app_module.app.test_client(), f'/api/clients/{client_id}/events', received[index],
+                                   ready, done))
+            for index in range(streams)
+        ]
+        for reader in readers:
+            reader.start()
+        for _ in readers:
+            ready.acquire()
+
+        committed, commit_times = [], []
+        with app_module.app.app_context():
+            for index in range(args.writes):
+                start = time.perf_counter()
+                app_module.transition_reminders(reminder_ids, 'completed' if index % 2 == 0 else 'active')
+                committed.append(time.perf_counter())
+                commit_times.append(committed[-1] - start)
+                # Spread the writes out so each one is delivered on its own
+                time.sleep(0.002)
+        time.sleep(1)
+        done.set()
+        for reader in readers:
+            reader.join(2)
+
+        delays = [
+            arrival - sent
+            for arrivals in received
+            for sent, arrival in zip(committed, arrivals)
+        ]
+        total = sum(len(arrivals) for arrivals in received)
+        print(f"{streams:>7} {percentile(commit_times, 0.5):>8.2f} ms {percentile(delays, 0.5):>9.2f} ms "
+              f"{percentile(delays, 0.95):>9.2f} ms {total:>5}/{streams * args.writes}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Bulk progress metric ingest throughput benchmark.
+
+Onboards a set of clients, then posts N samples spread across them to
+/api/progress-metrics/ingest as NDJSON and as a JSON array, and reports
+samples per second for each size and format.
+
+    python benchmarks/bench_ingest.py --sizes 1000 10000 100000
+    python benchmarks/bench_ingest.py --database-url postgresql://localhost/axiom_bench
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+METRICS = [
+    ('Implementation Progress', 'percentage', 'Overall'),
+    ('Strategic Initiatives', 'count', 'Strategy'),
+    ('Team Engagement', 'percentage', 'Team'),
+    ('Risk Mitigation', 'percentage', 'Risk'),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='samples per run')
+    parser.add_argument('--clients', type=int, default=50, help='clients the samples are spread across')
+    parser.add_argument('--database-url', default=None,
+                        help='database to run against (defaults to a temporary SQLite file)')
+    return parser.parse_args()
+
+
+def make_events(count):
+    return [{
+        'stripe_data': {
+            'id': f"cs_ingest_{uuid.uuid4().hex[:12]}",
+            'customer_email': f'ingest{index}@example.com',
+            'customer_details': {'name': f'Ingest Bench {index}'},
+            'metadata': {'industry': 'Technology', 'complexity_score': '40'}
+        }
+    } for index in range(count)]
+
+
+def make_samples(client_ids, count, rng):
+    start = datetime(2026, 1, 1)
+    samples = []
+    for index in range(count):
+        metric_name, metric_type, category = rng.choice(METRICS)
+        samples.append({
+            'client_id': rng.choice(client_ids),
+            'metric_name': metric_name,
+            'metric_value': round(rng.uniform(0, 100), 2),
+            'metric_type': metric_type,
+            'category': category,
+            'recorded_at': (start + timedelta(seconds=index * 7)).isoformat()
+        })
+    return samples
+
+
+def run(client, body, content_type, expected):
+    start = time.perf_counter()
+    response = client.post('/api/progress-metrics/ingest', data=body, content_type=content_type)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.json
+    assert response.json['summary']['accepted'] == expected, response.json['summary']
+    return elapsed
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ.setdefault('LOG_FORMAT', 'plain')
+
+    import app as app_module
+
+    client = app_module.app.test_client()
+    response = client.post('/webhook/payment-confirmed/batch', json=make_events(args.clients))
+    client_ids = [result['client_id'] for result in response.json['results']]
+    rng = random.Random(1)
+
+    print(f"{'samples':>8} {'ndjson':>12} {'array':>12}")
+    for size in args.sizes:
+        samples = make_samples(client_ids, size, rng)
+        ndjson = ''.join(json.dumps(sample) + '\n' for sample in samples).encode()
+        ndjson_elapsed = run(client, ndjson, 'application/x-ndjson', size)
+        array_elapsed = run(client, json.dumps(samples).encode(), 'application/json', size)
+        print(f"{size:>8} {size / ndjson_elapsed:>10.0f}/s {size / array_elapsed:>10.0f}/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Onboarding throughput benchmark.
+
+Compares the legacy onboarding path (one commit per stage, children added one
+ORM object at a time) with the single-transaction bulk pipeline.
+
+    python benchmarks/bench_onboarding.py --clients 500
+    python benchmarks/bench_onboarding.py --database-url postgresql://localhost/axiom_bench
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200, help='clients onboarded per run')
+    parser.add_argument('--database-url', default=None,
+                        help='database to benchmark against (defaults to a temporary SQLite file)')
+    return parser.parse_args()
+
+
+def legacy_onboard(app_module, client_id, client_info):
+    """The pre-pipeline onboarding path: four commits, row-at-a-time children"""
+    db = app_module.db
+    db.session.add(app_module.create_enterprise_client(client_id, client_info))
+    db.session.commit()
+    for model, rows in app_module.initialize_enterprise_features(client_id, client_info).items():
+        for row in rows:
+            db.session.add(model(**row))
+        db.session.commit()
+
+
+def run(app_module, onboard, clients, label):
+    infos = []
+    for i in range(clients):
+        info = app_module.extract_client_info_from_n8n({
+            'client_name': f'Bench {label} {i}',
+            'customer_email': f'bench{i}@example.com',
+            'project_id': uuid.uuid4().hex[:12]
+        })
+        client_id = f"{info['company_name'].lower().replace(' ', '-')}-{info['session_id']}"
+        infos.append((client_id, info))
+
+    start = time.perf_counter()
+    for client_id, info in infos:
+        onboard(client_id, info)
+    elapsed = time.perf_counter() - start
+    return clients / elapsed, elapsed
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    import app as app_module
+
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        backend = app_module.db.engine.dialect.name
+        legacy = run(app_module, lambda cid, info: legacy_onboard(app_module, cid, info),
+                     args.clients, 'legacy')
+        bulk = run(app_module, app_module.onboard_enterprise_client, args.clients, 'bulk')
+
+    print(f"backend: {backend}, clients per run: {args.clients}")
+    print(f"legacy (4 commits):   {legacy[0]:8.1f} clients/s  ({legacy[1]:.2f}s)")
+    print(f"bulk   (1 commit):    {bulk[0]:8.1f} clients/s  ({bulk[1]:.2f}s)")
+    print(f"speedup: {bulk[0] / legacy[0]:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Response serialization and compression benchmark.
+
+Seeds one client with a realistic number of child rows and, for the
+dashboard and list endpoints, compares the stdlib and orjson providers
+(JSON encoding CPU per response and full request time with the response
+cache off) and the bytes on the wire for identity, gzip and brotli.
+
+    python benchmarks/bench_serialization.py --rows 100 --iterations 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROUTES = ['', '/reminders', '/documents', '/progress', '/dashboard']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=30, help='copies of the onboarding child rows for the client')
+    parser.add_argument('--iterations', type=int, default=300, help='requests timed per route and provider')
+    return parser.parse_args()
+
+
+def seed(app_module, app, rows):
+    from sqlalchemy import insert
+
+    client = app.test_client()
+    client.post('/webhook/payment-confirmed', json={
+        'stripe_data': {'id': 'cs_serialization', 'customer_email': 'bench@example.com',
+                        'customer_details': {'name': 'Serialization Bench'}, 'metadata': {'complexity_score': '45'}}
+    })
+    client_id = 'serialization-bench-cs_serialization'
+    with app.app_context():
+        client_info = app_module.db.session.get(app_module.Client, client_id)
+        info = {'company_name': client_info.company_name, 'industry': client_info.industry,
+                'complexity_score': client_info.complexity_score}
+        for _ in range(rows - 1):
+            for model, model_rows in app_module.initialize_enterprise_features(client_id, info).items():
+                app_module.db.session.execute(insert(model), model_rows)
+        app_module.db.session.commit()
+    return client_id
+
+
+def time_requests(client, path, iterations, headers=None):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        response = client.get(path, headers=headers or {})
+        assert response.status_code == 200
+    return (time.perf_counter() - start) / iterations, response
+
+
+def main():
+    args = parse_args()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ.setdefault('LOG_FORMAT', 'plain')
+
+    import app as app_module
+
+    apps = {
+        provider: app_module.create_app({'JSON_PROVIDER': provider, 'RESPONSE_CACHE_ENABLED': False,
+                                         'COMPRESSION_ENABLED': False, 'PROFILING_ENABLED': True,
+                                         'PROFILING_SAMPLE_RATE': 0.0})
+        for provider in ('stdlib', 'orjson')
+    }
+    client_id = seed(app_module, apps['stdlib'], args.rows)
+    compressed = app_module.create_app({'RESPONSE_CACHE_ENABLED': False, 'COMPRESSION_MIN_SIZE': 0}).test_client()
+
+    print(f"{'route':<12} {'stdlib ser':>11} {'orjson ser':>11} {'stdlib req':>11} {'orjson req':>11} "
+          f"{'identity':>9} {'gzip':>8} {'br':>8}")
+    for route in ROUTES:
+        path = f'/api/clients/{client_id}{route}'
+        serialize = {}
+        request_time = {}
+        for provider, app in apps.items():
+            client = app.test_client()
+            time_requests(client, path, 20)
+            spans = []
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                response = client.get(path)
+                timing = dict(
+                    (part.split(';')[0].strip(), float(part.split('dur=')[1].split(';')[0]))
+                    for part in response.headers['Server-Timing'].split(',')
+                )
+                spans.append(timing.get('serialize', 0.0))
+            request_time[provider] = (time.perf_counter() - start) / args.iterations * 1000
+            serialize[provider] = sum(spans) / len(spans)
+        sizes = {encoding: len(compressed.get(path, headers={'Accept-Encoding': encoding}).data)
+                 for encoding in ('identity', 'gzip', 'br')}
+        print(f"{route or '/':<12} {serialize['stdlib']:>9.3f}ms {serialize['orjson']:>9.3f}ms "
+              f"{request_time['stdlib']:>9.3f}ms {request_time['orjson']:>9.3f}ms "
+              f"{sizes['identity']:>8}B {sizes['gzip']:>7}B {sizes['br']:>7}B")
+
+
+if __name__ == '__main__':
+    main()
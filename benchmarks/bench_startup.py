@@ -0,0 +1,74 @@
+"""
+Cold boot benchmark.
+
+Starts gunicorn against a fresh database and measures the time from process
+launch until /health first answers 200, averaged over several runs.
+
+    python benchmarks/bench_startup.py --workers 4 --runs 5
+    python benchmarks/bench_startup.py --preload --database-url postgresql://localhost/axiom_bench
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--runs', type=int, default=5, help='boots to average over')
+    parser.add_argument('--preload', action='store_true', help='run gunicorn with preload_app')
+    parser.add_argument('--app', default='app:app', help='WSGI application to boot')
+    parser.add_argument('--database-url', default=None,
+                        help='database to boot against (defaults to a fresh temporary SQLite file per run)')
+    parser.add_argument('--timeout', type=float, default=60, help='seconds to wait for /health')
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def boot_once(args):
+    port = free_port()
+    env = dict(os.environ)
+    env['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'startup.db')
+    env['GUNICORN_PRELOAD'] = 'true' if args.preload else 'false'
+    command = [sys.executable, '-m', 'gunicorn', '--workers', str(args.workers),
+               '--bind', f'127.0.0.1:{port}', args.app]
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < args.timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f'/health did not answer within {args.timeout}s')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    args = parse_args()
+    timings = [boot_once(args) for _ in range(args.runs)]
+    print(f"workers: {args.workers}, preload: {args.preload}, runs: {args.runs}")
+    print(f"boot to first /health: median {statistics.median(timings) * 1000:.0f}ms, "
+          f"min {min(timings) * 1000:.0f}ms, max {max(timings) * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
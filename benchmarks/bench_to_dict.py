@@ -0,0 +1,107 @@
+"""
+Client.to_dict throughput microbenchmark.
+
+Measures serialization of freshly loaded rows (JSON columns decoded once at
+load time), repeated serialization of the same instances (memoized dict) and,
+for comparison, the legacy path that ran json.loads on every to_dict call.
+
+    python benchmarks/bench_to_dict.py --clients 200 --rounds 20
+    python benchmarks/bench_to_dict.py --database-url postgresql://localhost/axiom_bench
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200, help='clients seeded and serialized')
+    parser.add_argument('--rounds', type=int, default=20, help='serialization passes per mode')
+    parser.add_argument('--database-url', default=None,
+                        help='database to benchmark against (defaults to a temporary SQLite file)')
+    return parser.parse_args()
+
+
+def legacy_to_dict(client, encoded):
+    """The pre-JSON-column to_dict: decode the three text blobs on every call"""
+    payload = client.serialize()
+    payload['business_context'] = json.loads(encoded['business_context'])
+    payload['current_challenges'] = json.loads(encoded['current_challenges'])
+    payload['recommended_solutions'] = json.loads(encoded['recommended_solutions'])
+    return payload
+
+
+def timed(label, calls, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {calls / elapsed:12.0f} to_dict/s")
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    import app as app_module
+    db = app_module.db
+    Client = app_module.Client
+
+    with app_module.app.app_context():
+        db.create_all()
+        client_ids = []
+        for i in range(args.clients):
+            info = app_module.extract_client_info_from_n8n({
+                'client_name': f'Serialize Bench {i}',
+                'customer_email': f'bench{i}@example.com',
+                'project_id': uuid.uuid4().hex[:12]
+            })
+            client_id = f"{info['company_name'].lower().replace(' ', '-')}-{info['session_id']}"
+            app_module.onboard_enterprise_client(client_id, info)
+            client_ids.append(client_id)
+
+        calls = args.clients * args.rounds
+        print(f"backend: {db.engine.dialect.name}, clients: {args.clients}, rounds: {args.rounds}")
+
+        clients = Client.query.filter(Client.id.in_(client_ids)).all()
+        encoded = {
+            client.id: {
+                'business_context': json.dumps(client.business_context),
+                'current_challenges': json.dumps(client.current_challenges),
+                'recommended_solutions': json.dumps(client.recommended_solutions)
+            }
+            for client in clients
+        }
+
+        def run_legacy():
+            for _ in range(args.rounds):
+                for client in clients:
+                    legacy_to_dict(client, encoded[client.id])
+
+        def run_cold():
+            for _ in range(args.rounds):
+                db.session.expire_all()
+                for client in Client.query.filter(Client.id.in_(client_ids)):
+                    client.to_dict()
+
+        def run_warm():
+            for _ in range(args.rounds):
+                for client in clients:
+                    client.to_dict()
+
+        timed('legacy (json.loads per call)', calls, run_legacy)
+        timed('load + to_dict (cold)', calls, run_cold)
+        clients = Client.query.filter(Client.id.in_(client_ids)).all()
+        timed('to_dict (memoized)', calls, run_warm)
+
+
+if __name__ == '__main__':
+    main()
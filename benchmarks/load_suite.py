@@ -0,0 +1,280 @@
+"""
+Endpoint load suite.
+
+Seeds a database with clients and enterprise feature rows shaped exactly like
+onboarding produces, boots gunicorn against it and drives every route at a
+fixed concurrency. Reports p50/p95/p99 latency and throughput per scenario
+and, given a baseline file, flags scenarios that regressed beyond a
+tolerance (exit status 1).
+
+    python benchmarks/load_suite.py --clients 500 --requests 1000 --concurrency 16
+    python benchmarks/load_suite.py --save-baseline benchmarks/baseline-sqlite.json
+    python benchmarks/load_suite.py --baseline benchmarks/baseline-sqlite.json
+    python benchmarks/load_suite.py --database-url postgresql://localhost/axiom_bench \\
+        --baseline benchmarks/baseline-postgres.json
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+INDUSTRIES = ['Technology', 'Manufacturing', 'Healthcare', 'Finance', 'Retail']
+
+SCENARIOS = [
+    'payment_new',
+    'payment_duplicate',
+    'get_client',
+    'get_reminders',
+    'get_documents',
+    'get_progress',
+    'dashboard_delivered',
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', default=None,
+                        help='database to seed and serve (defaults to a temporary SQLite file)')
+    parser.add_argument('--clients', type=int, default=200, help='clients to seed')
+    parser.add_argument('--child-multiplier', type=int, default=10,
+                        help='copies of the onboarding child rows per seeded client')
+    parser.add_argument('--requests', type=int, default=500, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent connections')
+    parser.add_argument('--warmup', type=int, default=50, help='unmeasured requests before each scenario')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--no-cache', action='store_true', help='serve with the response cache disabled')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for request selection')
+    parser.add_argument('--baseline', help='baseline JSON file to compare against')
+    parser.add_argument('--save-baseline', help='write this run to a baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative p95 increase or throughput drop before flagging')
+    return parser.parse_args()
+
+
+def payment_event(label, index):
+    return {
+        'stripe_data': {
+            'id': f"cs_load_{uuid.uuid4().hex[:12]}",
+            'customer_email': f'load{index}@example.com',
+            'customer_details': {'name': f'Load {label} {index}'},
+            'metadata': {'industry': INDUSTRIES[index % len(INDUSTRIES)], 'complexity_score': str(20 + index % 60)}
+        }
+    }
+
+
+def seed(app_module, clients, child_multiplier):
+    """Create clients through the onboarding pipeline; returns (client_id, event) pairs"""
+    seeded = []
+    for index in range(clients):
+        event = payment_event('seed', index)
+        client_info = app_module.extract_client_info_from_n8n(event)
+        seeded.append((app_module.derive_client_id(client_info), client_info, event))
+
+    with app_module.app.app_context():
+        app_module.migrations.upgrade(app_module.db.engine, app_module.db.metadata)
+        app_module.onboard_enterprise_clients([(client_id, info) for client_id, info, _ in seeded])
+        # Extra copies of the onboarding rows make the list endpoints realistic
+        for start in range(0, len(seeded), 100):
+            rows = {}
+            for client_id, client_info, _ in seeded[start:start + 100]:
+                for _ in range(child_multiplier - 1):
+                    for model, model_rows in app_module.initialize_enterprise_features(client_id, client_info).items():
+                        rows.setdefault(model, []).extend(model_rows)
+            for model, model_rows in rows.items():
+                app_module.insert_feature_rows(model, model_rows)
+            app_module.db.session.commit()
+
+    return [(client_id, event) for client_id, _, event in seeded]
+
+
+def build_requests(scenario, seeded, count, rng):
+    """Return (method, path, body) tuples for a scenario"""
+    if scenario == 'payment_new':
+        return [('POST', '/webhook/payment-confirmed', payment_event('new', index)) for index in range(count)]
+    picks = [rng.choice(seeded) for _ in range(count)]
+    if scenario == 'payment_duplicate':
+        return [('POST', '/webhook/payment-confirmed', event) for _, event in picks]
+    if scenario == 'dashboard_delivered':
+        return [('POST', '/webhook/dashboard-delivered',
+                 {'client_id': client_id, 'dashboard_url': f'https://example.com/client/{client_id}'})
+                for client_id, _ in picks]
+    suffix = {'get_client': '', 'get_reminders': '/reminders', 'get_documents': '/documents',
+              'get_progress': '/progress'}[scenario]
+    return [('GET', f'/api/clients/{client_id}{suffix}', None) for client_id, _ in picks]
+
+
+def drive(port, requests, concurrency):
+    """Send requests over `concurrency` keep-alive connections; returns (latencies, errors, elapsed)"""
+    pending = queue.Queue()
+    for item in requests:
+        pending.put(item)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while True:
+            try:
+                method, path, body = pending.get_nowait()
+            except queue.Empty:
+                break
+            payload = json.dumps(body).encode() if body is not None else None
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(status)
+        connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies) + len(errors),
+        'errors': len(errors),
+        'throughput': round((len(latencies) + len(errors)) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions against the baseline"""
+    regressions = []
+    for scenario, result in results.items():
+        reference = baseline.get('scenarios', {}).get(scenario)
+        if not reference:
+            continue
+        if result['errors'] > reference.get('errors', 0):
+            regressions.append(f"{scenario}: {result['errors']} errors (baseline {reference.get('errors', 0)})")
+        if result['p95_ms'] and reference.get('p95_ms') and result['p95_ms'] > reference['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {result['p95_ms']}ms (baseline {reference['p95_ms']}ms)")
+        if reference.get('throughput') and result['throughput'] < reference['throughput'] * (1 - tolerance):
+            regressions.append(f"{scenario}: {result['throughput']} req/s (baseline {reference['throughput']} req/s)")
+    return regressions
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, port):
+    env = dict(os.environ)
+    env['RESPONSE_CACHE_ENABLED'] = 'false' if args.no_cache else env.get('RESPONSE_CACHE_ENABLED', 'true')
+    env['LOG_LEVEL'] = env.get('LOG_LEVEL', 'WARNING')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(args.workers), '--bind', f'127.0.0.1:{port}', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError('gunicorn did not become healthy within 60s')
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'load.db')
+    os.environ.setdefault('LOG_FORMAT', 'plain')
+
+    import app as app_module
+
+    start = time.perf_counter()
+    seeded = seed(app_module, args.clients, args.child_multiplier)
+    print(f"seeded {args.clients} clients x{args.child_multiplier} child rows in {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(args.seed)
+    port = free_port()
+    server = start_server(args, port)
+    results = {}
+    try:
+        print(f"{'scenario':<20} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for scenario in args.scenarios:
+            # Warm worker caches and connections so scenario order does not skew results
+            drive(port, build_requests(scenario, seeded, args.warmup, rng), args.concurrency)
+            requests = build_requests(scenario, seeded, args.requests, rng)
+            result = results[scenario] = summarize(*drive(port, requests, args.concurrency))
+            print(f"{scenario:<20} {result['throughput']:>9} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+                  f"{result['p99_ms']:>9} {result['errors']:>7}")
+    finally:
+        server.terminate()
+        server.wait()
+
+    settings = {key: getattr(args, key) for key in
+                ('clients', 'child_multiplier', 'requests', 'concurrency', 'workers', 'no_cache')}
+    settings['database'] = os.environ['DATABASE_URL'].split(':', 1)[0]
+    run = {'settings': settings, 'scenarios': results}
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump(run, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('settings') != run['settings']:
+            print(f"warning: baseline settings {baseline.get('settings')} differ from this run")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
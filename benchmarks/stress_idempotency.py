@@ -0,0 +1,92 @@
+"""
+Duplicate payment webhook stress test.
+
+Fires the same payment confirmation from many threads at once and checks
+that exactly one client is onboarded, template generation runs once and
+every delivery gets a non-5xx response. Exits non-zero on a violation.
+
+    python benchmarks/stress_idempotency.py --concurrency 32 --rounds 5
+    python benchmarks/stress_idempotency.py --database-url postgresql://localhost/axiom_bench
+"""
+import argparse
+import collections
+import os
+import sys
+import tempfile
+import threading
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=32, help='identical webhooks fired at once')
+    parser.add_argument('--rounds', type=int, default=5, help='distinct payments to stress')
+    parser.add_argument('--database-url', default=None,
+                        help='database to run against (defaults to a temporary SQLite file)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'stress.db')
+
+    import app as app_module
+
+    generations = collections.Counter()
+    generate_business_context = app_module.generate_business_context
+
+    def counting_generate_business_context(client_info):
+        generations[client_info['session_id']] += 1
+        return generate_business_context(client_info)
+
+    app_module.generate_business_context = counting_generate_business_context
+
+    failed = False
+    for round_number in range(args.rounds):
+        session_id = f"cs_stress_{uuid.uuid4().hex[:12]}"
+        payload = {
+            'stripe_data': {
+                'id': session_id,
+                'customer_email': 'stress@example.com',
+                'customer_details': {'name': f'Stress Test {round_number}'},
+                'metadata': {'industry': 'Technology', 'complexity_score': '43'}
+            }
+        }
+        barrier = threading.Barrier(args.concurrency)
+        statuses = collections.Counter()
+        client_ids = set()
+        lock = threading.Lock()
+
+        def deliver():
+            client = app_module.app.test_client()
+            barrier.wait()
+            response = client.post('/webhook/payment-confirmed', json=payload)
+            with lock:
+                statuses[response.status_code] += 1
+                if response.status_code < 300:
+                    client_ids.add(response.json['client_id'])
+
+        threads = [threading.Thread(target=deliver) for _ in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with app_module.app.app_context():
+            stored = app_module.Client.query.filter_by(session_id=session_id).count()
+
+        ok = stored == 1 and generations[session_id] == 1 and not any(code >= 500 for code in statuses)
+        failed = failed or not ok
+        print(f"round {round_number}: responses {dict(statuses)}, clients stored {stored}, "
+              f"generations {generations[session_id]} -> {'ok' if ok else 'FAIL'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Response cache backends for the client read endpoints.
+
+Entries are grouped by client so that every cached response for a client
+can be dropped at once when one of its rows changes. The in-process LRU
+backend is per worker; deployments running several workers that need
+cross-worker invalidation should plug in an external backend implementing
+CacheBackend.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheBackend:
+    """Storage interface for cached responses, keyed by client and endpoint key"""
+
+    def get(self, client_id, key):
+        """Return the cached value, or None on a miss"""
+        raise NotImplementedError
+
+    def set(self, client_id, key, value):
+        """Store a value for a client's endpoint key"""
+        raise NotImplementedError
+
+    def invalidate(self, client_id):
+        """Drop every entry cached for a client"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Return hit, miss and eviction counters"""
+        raise NotImplementedError
+
+
+class NullCacheBackend(CacheBackend):
+    """Backend used when caching is disabled; every lookup misses"""
+
+    def __init__(self):
+        self.misses = 0
+
+    def get(self, client_id, key):
+        self.misses += 1
+        return None
+
+    def set(self, client_id, key, value):
+        pass
+
+    def invalidate(self, client_id):
+        pass
+
+    def stats(self):
+        return {'backend': 'null', 'hits': 0, 'misses': self.misses, 'evictions': 0,
+                'expirations': 0, 'invalidations': 0, 'entries': 0}
+
+
+class LRUCacheBackend(CacheBackend):
+    """Thread-safe in-process LRU cache with a per-entry TTL and a size limit"""
+
+    def __init__(self, max_entries=1024, ttl=300, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._client_keys = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, client_id, key):
+        with self._lock:
+            entry = self._entries.get((client_id, key))
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                self._remove((client_id, key))
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end((client_id, key))
+            self.hits += 1
+            return value
+
+    def set(self, client_id, key, value):
+        with self._lock:
+            self._entries[(client_id, key)] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end((client_id, key))
+            self._client_keys.setdefault(client_id, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, client_id):
+        with self._lock:
+            keys = self._client_keys.pop(client_id, ())
+            for key in keys:
+                self._entries.pop((client_id, key), None)
+            if keys:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'lru',
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl
+            }
+
+    def _remove(self, entry_key):
+        client_id, key = entry_key
+        self._entries.pop(entry_key, None)
+        keys = self._client_keys.get(client_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._client_keys[client_id]
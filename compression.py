@@ -0,0 +1,55 @@
+"""
+Response compression negotiated through Accept-Encoding.
+
+Brotli is offered when the brotli package is installed, gzip always.
+Bodies below a size threshold, streamed responses and bodies that already
+carry a Content-Encoding are sent as they are. Compressing changes the
+bytes but not the resource, so any ETag is downgraded to a weak one; the
+read endpoints compare If-None-Match weakly for that reason.
+"""
+import gzip
+
+from profiling import profiled
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = frozenset({'application/json', 'text/plain', 'text/html', 'text/csv'})
+
+
+def available_encodings():
+    """Supported encodings in order of preference"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+@profiled('compress')
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def compress_response(response, accept_encodings, min_size=1024, gzip_level=6, brotli_quality=4):
+    """Compress a response in place when the client accepts a supported encoding"""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)):
+        return response
+
+    encoding = accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    response.set_data(compress(data, encoding, gzip_level, brotli_quality))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,67 @@
+"""
+Write-behind counters.
+
+Increments are added to an in-memory buffer in each worker process and
+written to the database periodically, one batched
+`UPDATE ... SET count = count + n` per flush, instead of a row lock and a
+commit per event. Increments for the same row and column are summed while
+they are buffered, so a popular row costs one UPDATE per flush however
+often it is hit.
+
+Until a flush, the database holds only approximate counts. Live counts are
+approximated as the stored value plus this process's pending increments;
+increments buffered by other processes appear after their next flush.
+Increments not yet flushed are lost if a process dies without running its
+shutdown flush.
+"""
+import threading
+
+
+class CounterBuffer:
+    """Thread-safe buffer of pending increments keyed by (row key, column)"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.increments = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def increment(self, key, column, amount=1):
+        """Buffer an increment; returns True once the buffer should be flushed early"""
+        with self._lock:
+            self._pending[key, column] = self._pending.get((key, column), 0) + amount
+            self.increments += 1
+            return len(self._pending) >= self.max_keys
+
+    def pending(self, key, column):
+        return self._pending.get((key, column), 0)
+
+    def drain(self):
+        """Take every pending increment, leaving the buffer empty"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def restore(self, pending):
+        """Put back increments from a flush that failed"""
+        with self._lock:
+            for key, amount in pending.items():
+                self._pending[key] = self._pending.get(key, 0) + amount
+
+    def record_flush(self, rows):
+        with self._lock:
+            self.flushes += 1
+            self.flushed_rows += rows
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'increments': self.increments,
+            'flushes': self.flushes,
+            'flushed_rows': self.flushed_rows
+        }
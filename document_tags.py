@@ -0,0 +1,30 @@
+"""
+Normalized document tags.
+
+Document.tags keeps the tags as written. Each document's tags are also
+stored in the document_tags table, one row per tag, lowercased, stripped
+and de-duplicated, so tag queries become indexed lookups on both Postgres
+and SQLite. Search terms are normalized the same way before matching.
+"""
+MAX_TAG_LENGTH = 255
+
+
+def normalize_tags(tags):
+    """Tags as stored in document_tags; entries that are not usable strings are skipped"""
+    normalized = []
+    for tag in tags or ():
+        if not isinstance(tag, str):
+            continue
+        tag = tag.strip().lower()
+        if tag and len(tag) <= MAX_TAG_LENGTH and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+def tag_rows(documents):
+    """document_tags rows for (document_id, client_id, tags) triples"""
+    return [
+        {'document_id': document_id, 'client_id': client_id, 'tag': tag}
+        for document_id, client_id, tags in documents
+        for tag in normalize_tags(tags)
+    ]
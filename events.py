@@ -0,0 +1,300 @@
+"""
+Change event fan-out for the client server-sent event streams.
+
+Committed writes are published as one event per changed client, and a
+broker hands each event to the streams subscribed to that client in this
+process. Every stream has its own bounded queue, so a slow reader never
+holds up publishing or other streams; one that falls behind is sent a
+reset instead of the events it missed.
+
+The broker keeps a short history of recent events per client so a
+reconnecting stream can resume after the last event it received
+(Last-Event-ID). If that event is no longer in the history the stream is
+sent a reset, which tells the reader to refetch everything.
+
+LocalBroker delivers events published in this process only, which is
+enough for a single worker and for tests. PostgresBroker publishes with
+NOTIFY and delivers what one LISTEN connection per process receives, so
+every worker sees every commit. Event ids are assigned by the publisher,
+so they are the same in every process and a stream can resume on any
+worker.
+"""
+import itertools
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+from collections import OrderedDict, deque, namedtuple
+
+from sqlalchemy import func, select as sql_select
+
+logger = logging.getLogger(__name__)
+
+ChangeEvent = namedtuple('ChangeEvent', ['id', 'type', 'client_id', 'data'])
+
+# NOTIFY payloads must stay below 8000 bytes
+MAX_NOTIFY_PAYLOAD = 7900
+
+
+class TooManySubscribers(Exception):
+    """This process already serves its maximum number of streams"""
+
+
+def encode_event(event):
+    """Format an event as a server-sent event frame"""
+    # An empty id clears the reader's last event id, so it does not resume from an unknown one
+    return f"id: {event.id or ''}\nevent: {event.type}\ndata: {json.dumps(event.data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """A stream's queue of events for one client"""
+
+    def __init__(self, broker, client_id, max_queue):
+        self.broker = broker
+        self.client_id = client_id
+        self.max_queue = max_queue
+        self.overflowed = False
+        self._events = deque()
+        self._ready = threading.Event()
+
+    def get(self, timeout):
+        """Wait up to timeout seconds for events; returns those queued, possibly none"""
+        if not self._ready.wait(timeout):
+            return []
+        return self.broker._drain(self)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def _push(self, event):
+        if len(self._events) >= self.max_queue:
+            self.overflowed = True
+        else:
+            self._events.append(event)
+        self._ready.set()
+
+
+class LocalBroker:
+    """
+    Thread-safe fan-out of change events to this process's subscribers.
+    on_deliver, when given, is called with each delivered event's client id
+    before any stream sees the event, e.g. to drop per-process cached
+    responses that a reader would otherwise refetch.
+    """
+
+    def __init__(self, history_size=100, max_clients=10000, max_subscribers=100, queue_size=1000, on_deliver=None):
+        self.on_deliver = on_deliver
+        self.history_size = history_size
+        self.max_clients = max_clients
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._history = OrderedDict()
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._prefix = uuid.uuid4().hex[:8]
+        self._sequence = itertools.count(1)
+        self.published = 0
+        self.delivered = 0
+        self.resets = 0
+
+    @property
+    def running(self):
+        return True
+
+    def start(self):
+        pass
+
+    def stop(self, timeout=None):
+        pass
+
+    def new_event(self, client_id, data):
+        return ChangeEvent(f"{self._prefix}-{next(self._sequence)}", 'change', client_id, data)
+
+    def publish(self, changes):
+        """Publish a {client_id: data} mapping of committed changes"""
+        events = [self.new_event(client_id, data) for client_id, data in changes.items()]
+        with self._lock:
+            self.published += len(events)
+        self.deliver(events)
+
+    def deliver(self, events):
+        """Record events in the history and queue them for their subscribers"""
+        if self.on_deliver is not None:
+            for event in events:
+                self.on_deliver(event.client_id)
+        with self._lock:
+            for event in events:
+                history = self._history.get(event.client_id)
+                if history is None:
+                    history = self._history[event.client_id] = deque(maxlen=self.history_size)
+                    while len(self._history) > self.max_clients:
+                        self._history.popitem(last=False)
+                else:
+                    self._history.move_to_end(event.client_id)
+                history.append(event)
+                for subscription in self._subscribers.get(event.client_id, ()):
+                    subscription._push(event)
+                    self.delivered += 1
+
+    def subscribe(self, client_id, last_event_id=None):
+        """
+        Open a subscription for a client. Events after last_event_id are
+        queued for replay; when it is not in the history, a reset is queued
+        instead. Raises TooManySubscribers when this process is full.
+        """
+        with self._lock:
+            if sum(len(subscriptions) for subscriptions in self._subscribers.values()) >= self.max_subscribers:
+                raise TooManySubscribers(f'At most {self.max_subscribers} event streams per process')
+            subscription = Subscription(self, client_id, self.queue_size)
+            if last_event_id:
+                history = list(self._history.get(client_id, ()))
+                ids = [event.id for event in history]
+                if last_event_id in ids:
+                    for event in history[ids.index(last_event_id) + 1:]:
+                        subscription._push(event)
+                else:
+                    subscription.overflowed = True
+                    subscription._ready.set()
+            self._subscribers.setdefault(client_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.client_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.client_id]
+
+    def reset_all(self):
+        """Send every subscriber a reset, e.g. after events may have been missed"""
+        with self._lock:
+            for subscriptions in self._subscribers.values():
+                for subscription in subscriptions:
+                    subscription.overflowed = True
+                    subscription._ready.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'local',
+                'subscribers': sum(len(subscriptions) for subscriptions in self._subscribers.values()),
+                'clients': len(self._history),
+                'published': self.published,
+                'delivered': self.delivered,
+                'resets': self.resets
+            }
+
+    def _drain(self, subscription):
+        with self._lock:
+            subscription._ready.clear()
+            if subscription.overflowed:
+                # The reset carries the newest id, so the reader resumes after what it refetches
+                subscription.overflowed = False
+                subscription._events.clear()
+                history = self._history.get(subscription.client_id)
+                self.resets += 1
+                return [ChangeEvent(history[-1].id if history else None, 'reset', subscription.client_id,
+                                    {'client_id': subscription.client_id})]
+            events = list(subscription._events)
+            subscription._events.clear()
+            return events
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Broker that publishes through Postgres NOTIFY on a channel and delivers
+    the notifications received on a dedicated LISTEN connection
+    """
+
+    def __init__(self, engine, channel='client_changes', reconnect_interval=5.0, **kwargs):
+        if not channel.isidentifier():
+            raise ValueError(f'Invalid NOTIFY channel name: {channel!r}')
+        super().__init__(**kwargs)
+        self.engine = engine
+        self.channel = channel
+        self.reconnect_interval = reconnect_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.notifications = 0
+
+    @property
+    def running(self):
+        # Threads do not survive a fork, so a listener started in the parent is not running here
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._start_lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def publish(self, changes):
+        """NOTIFY the changes; every process, this one included, delivers them when they arrive"""
+        payloads, batch, size = [], [], 2
+        for client_id, data in changes.items():
+            event = self.new_event(client_id, data)
+            encoded = json.dumps([event.id, client_id, data], separators=(',', ':'))
+            if batch and size + len(encoded) + 1 > MAX_NOTIFY_PAYLOAD:
+                payloads.append(f"[{','.join(batch)}]")
+                batch, size = [], 2
+            batch.append(encoded)
+            size += len(encoded) + 1
+        if batch:
+            payloads.append(f"[{','.join(batch)}]")
+        with self.engine.connect() as connection:
+            for payload in payloads:
+                connection.execute(sql_select(func.pg_notify(self.channel, payload)))
+            connection.commit()
+        with self._lock:
+            self.published += len(changes)
+
+    def stats(self):
+        return {**super().stats(), 'backend': 'postgres', 'listening': self.running,
+                'notifications': self.notifications}
+
+    def _listen(self):
+        while not self._stop.is_set():
+            connection = None
+            try:
+                # A connection of its own: it is held for as long as the process runs
+                cargs, cparams = self.engine.dialect.create_connect_args(self.engine.url)
+                connection = self.engine.dialect.connect(*cargs, **cparams)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                # Events published while the listener was down are gone
+                self.reset_all()
+                while not self._stop.is_set():
+                    if not select.select([connection], [], [], 1.0)[0]:
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notification = connection.notifies.pop(0)
+                        self.notifications += 1
+                        self.deliver([
+                            ChangeEvent(event_id, 'change', client_id, data)
+                            for event_id, client_id, data in json.loads(notification.payload)
+                        ])
+            except Exception:
+                logger.exception("Change event listener failed",
+                                 extra={'event': 'events.listener_failed', 'channel': self.channel})
+                self._stop.wait(self.reconnect_interval)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
@@ -0,0 +1,39 @@
+"""
+Gunicorn settings.
+
+The app factory opens no database connections at import time and engines
+are disposed in each forked worker, so preloading the app in the master is
+safe and lets workers share its imported code.
+
+Workers write Prometheus samples to files in PROMETHEUS_MULTIPROC_DIR so
+that /metrics can report totals across all of them (see metrics.py). The
+directory must be set before the app is imported, which is why it is
+chosen here.
+
+Workers are threaded so that long-lived server-sent event streams occupy
+a thread rather than a whole worker process. A stream waiting for events
+holds no database connection and costs almost nothing, but it does hold
+its thread; EVENT_MAX_SUBSCRIBERS in the app must stay below
+GUNICORN_THREADS so ordinary requests always find a free thread.
+"""
+import glob
+import os
+import tempfile
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+
+if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='axiom-metrics-')
+
+
+def on_starting(server):
+    # Samples left over from a previous server would be counted again
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
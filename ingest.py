@@ -0,0 +1,184 @@
+"""
+Streaming parsers and writers for bulk progress metric ingest.
+
+Request bodies are read incrementally, one line (NDJSON) or one array
+element (JSON) at a time, so memory use is bounded by the write chunk size
+rather than the body size. Each sample is validated on its own; a bad
+sample is reported and skipped without failing the rest of the body.
+Syntax errors in a JSON array end the stream, since nothing after them can
+be located reliably.
+
+Validated rows are written with COPY on Postgres, which avoids per-row
+statement overhead entirely; other databases use a chunked executemany.
+"""
+import codecs
+import csv
+import io
+import json
+import math
+from datetime import datetime, timezone
+
+READ_SIZE = 64 * 1024
+
+# Characters that can continue a JSON number
+NUMBER_CHARS = frozenset('0123456789.eE+-')
+
+# column -> maximum length for the string fields every sample must carry
+STRING_FIELDS = {'client_id': 255, 'metric_name': 255, 'metric_type': 50, 'category': 100}
+
+COPY_COLUMNS = ('client_id', 'metric_name', 'metric_value', 'metric_type', 'category', 'recorded_at')
+
+
+class InvalidSample(ValueError):
+    """A single sample failed validation"""
+
+
+class MalformedBody(ValueError):
+    """The body cannot be parsed any further"""
+
+
+def iter_ndjson(stream, max_line_bytes=READ_SIZE):
+    """Yield (line_number, value or InvalidSample) for each non-blank line"""
+    # WSGI input streams are raw; unbuffered readline reads a byte at a time
+    if isinstance(stream, io.RawIOBase):
+        stream = io.BufferedReader(stream, READ_SIZE)
+    line_number = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        line_number += 1
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # Discard the rest of the oversized line so the next one parses
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(READ_SIZE)
+            yield line_number, InvalidSample(f'Line exceeds {max_line_bytes} bytes')
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, InvalidSample(f'Invalid JSON: {e}')
+
+
+def iter_json_array(stream, max_element_bytes=READ_SIZE):
+    """
+    Yield (index, value) for each element of a top-level JSON array without
+    reading the whole array. Raises MalformedBody on a syntax error.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        data = stream.read(READ_SIZE)
+        if not data:
+            eof = True
+        buffer = buffer[position:] + utf8.decode(data, final=eof)
+        position = 0
+
+    def skip_whitespace():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if buffer[position:position + 1] != '[':
+        raise MalformedBody('Expected a JSON array')
+    position += 1
+    skip_whitespace()
+    if buffer[position:position + 1] == ']':
+        return
+
+    index = 0
+    while True:
+        skip_whitespace()
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except ValueError as e:
+            value, end = None, None
+            error = e
+        # A number followed only by number characters up to the end of the buffer may be cut off
+        # by the read boundary: raw_decode parses the prefix of -2500.25 in '-2500.' as -2500
+        truncated = (
+            not eof and end is not None and isinstance(value, (int, float)) and not isinstance(value, bool)
+            and all(char in NUMBER_CHARS for char in buffer[end:])
+        )
+        if end is None or truncated:
+            if eof:
+                raise MalformedBody(f'Invalid JSON at element {index}: {error.msg}')
+            if len(buffer) - position > max_element_bytes:
+                raise MalformedBody(f'Element {index} exceeds {max_element_bytes} bytes')
+            fill()
+            continue
+        yield index, value
+        index += 1
+        position = end
+        skip_whitespace()
+        delimiter = buffer[position:position + 1]
+        position += 1
+        if delimiter == ']':
+            skip_whitespace()
+            if position < len(buffer):
+                raise MalformedBody('Unexpected data after the JSON array')
+            return
+        if delimiter != ',':
+            raise MalformedBody(f"Expected ',' or ']' after element {index - 1}")
+
+
+def validate_sample(sample, now):
+    """Return the progress_metrics row for a sample, or raise InvalidSample"""
+    if not isinstance(sample, dict):
+        raise InvalidSample('Expected a JSON object')
+    row = {}
+    for field, max_length in STRING_FIELDS.items():
+        value = sample.get(field)
+        if not isinstance(value, str) or not value:
+            raise InvalidSample(f'{field} must be a non-empty string')
+        if len(value) > max_length:
+            raise InvalidSample(f'{field} must be at most {max_length} characters')
+        row[field] = value
+
+    value = sample.get('metric_value')
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise InvalidSample('metric_value must be a finite number')
+    row['metric_value'] = float(value)
+
+    recorded_at = sample.get('recorded_at')
+    if recorded_at is None:
+        row['recorded_at'] = now
+    else:
+        try:
+            recorded_at = datetime.fromisoformat(recorded_at)
+        except (TypeError, ValueError):
+            raise InvalidSample('recorded_at must be an ISO 8601 datetime')
+        # Timestamps are stored as naive UTC
+        if recorded_at.tzinfo is not None:
+            recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+        row['recorded_at'] = recorded_at
+    return row
+
+
+def copy_rows(connection, table, rows):
+    """Write rows to a Postgres table with COPY ... FROM STDIN in the connection's transaction"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            row[column].isoformat() if isinstance(row[column], datetime) else row[column]
+            for column in COPY_COLUMNS
+        ])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
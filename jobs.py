@@ -0,0 +1,83 @@
+"""
+Background worker pool for database-backed job queues.
+
+Each worker thread repeatedly calls a poll function inside an application
+context. The poll function claims and runs at most one job and returns
+whether it found work; idle workers sleep before polling again.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Identifies the claiming process in job rows
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def retry_delay(attempts, base=2.0, cap=300.0):
+    """Exponential backoff with jitter for the given number of failed attempts"""
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class WorkerPool:
+    """A fixed number of daemon threads polling a job queue"""
+
+    def __init__(self, app, poll, concurrency=2, idle_interval=1.0, name='worker'):
+        self.app = app
+        self.poll = poll
+        self.concurrency = concurrency
+        self.idle_interval = idle_interval
+        self.name = name
+        self._stop = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        # Threads do not survive a fork, so a pool started in the parent is not running here
+        return self._pid == os.getpid() and any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        with self._lock:
+            if self.running or self.concurrency <= 0:
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"{self.name}-{index}", daemon=True)
+                for index in range(self.concurrency)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run_forever(self):
+        """Run the pool in the foreground until interrupted"""
+        self.start()
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    worked = self.poll()
+            except Exception:
+                logger.exception(f"{self.name} poll failed")
+                worked = False
+            if not worked:
+                self._stop.wait(self.idle_interval)
@@ -0,0 +1,97 @@
+"""
+JSON providers for Flask responses.
+
+Model to_dict() methods return datetimes as they are and leave encoding to
+the provider, so both providers must write them as ISO 8601 strings. orjson
+does this natively; the stdlib provider converts them in default(). The
+orjson provider is used when the package is installed, unless JSON_PROVIDER
+selects the stdlib one.
+
+Compact mode (the default) writes no whitespace. Keys are not sorted unless
+JSON_SORT_KEYS is set, because sorting costs time on every response.
+"""
+import json
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from flask.json.provider import JSONProvider
+
+from profiling import profiled
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def encode_default(value):
+    """Encode the non-JSON types that appear in API payloads"""
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class StdlibJSONProvider(JSONProvider):
+    """json module provider writing ISO 8601 datetimes"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.compact = app.config.get('JSON_COMPACT', True)
+        self.sort_keys = app.config.get('JSON_SORT_KEYS', False)
+
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault('default', encode_default)
+        kwargs.setdefault('ensure_ascii', False)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        if self.compact:
+            kwargs.setdefault('separators', (',', ':'))
+        else:
+            kwargs.setdefault('indent', 2)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return json.loads(s, **kwargs)
+
+    @profiled('serialize')
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(f'{self.dumps(obj)}\n', mimetype='application/json')
+
+
+class OrjsonProvider(JSONProvider):
+    """orjson provider; encodes straight to bytes for responses"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.option = orjson.OPT_NON_STR_KEYS
+        if app.config.get('JSON_SORT_KEYS', False):
+            self.option |= orjson.OPT_SORT_KEYS
+        if not app.config.get('JSON_COMPACT', True):
+            self.option |= orjson.OPT_INDENT_2
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=encode_default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    @profiled('serialize')
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=encode_default, option=self.option | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype='application/json')
+
+
+PROVIDERS = {'stdlib': StdlibJSONProvider, 'orjson': OrjsonProvider}
+
+
+def get_provider_class(name):
+    """Resolve JSON_PROVIDER ('auto', 'orjson' or 'stdlib') to a provider class"""
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'stdlib'
+    if name == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_PROVIDER=orjson requires the orjson package')
+    return PROVIDERS[name]
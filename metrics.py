@@ -0,0 +1,118 @@
+"""
+Prometheus metrics for the service.
+
+Covers HTTP requests per route, SQL queries per model captured through
+engine events, connection pool checkout wait and onboarding stage timings.
+
+Under gunicorn every worker keeps its own samples. gunicorn.conf.py sets
+PROMETHEUS_MULTIPROC_DIR so that workers write samples to memory-mapped
+files there, and /metrics aggregates the files of every worker; a scrape
+reports totals for the whole server whichever worker answers it.
+"""
+import contextlib
+import functools
+import os
+import re
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Database work is mostly sub-millisecond, well below the default HTTP buckets
+DB_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5)
+
+HTTP_REQUESTS = Counter(
+    'axiom_http_requests_total', 'HTTP requests by route, method and status', ['route', 'method', 'status']
+)
+HTTP_LATENCY = Histogram(
+    'axiom_http_request_duration_seconds', 'HTTP request latency by route and method', ['route', 'method']
+)
+DB_QUERIES = Counter(
+    'axiom_db_queries_total', 'SQL statements executed by model and operation', ['model', 'operation']
+)
+DB_LATENCY = Histogram(
+    'axiom_db_query_duration_seconds', 'SQL statement latency by model and operation', ['model', 'operation'],
+    buckets=DB_BUCKETS
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    'axiom_db_pool_checkout_wait_seconds', 'Time spent checking a connection out of the pool', buckets=DB_BUCKETS
+)
+ONBOARDING_STAGE = Histogram(
+    'axiom_onboarding_stage_duration_seconds', 'Onboarding time by stage', ['stage'], buckets=DB_BUCKETS
+)
+
+# Where the table name sits for each kind of statement
+STATEMENT_TABLES = {
+    'INSERT': re.compile(r'\bINTO\s+"?(\w+)', re.IGNORECASE),
+    'UPDATE': re.compile(r'^\s*UPDATE\s+"?(\w+)', re.IGNORECASE),
+}
+DEFAULT_STATEMENT_TABLE = re.compile(r'\bFROM\s+"?(\w+)', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=2048)
+def classify_statement(statement):
+    """Return (operation, table) for a SQL string; table is None when there is none"""
+    parts = statement.split(None, 1)
+    operation = parts[0].upper() if parts else 'UNKNOWN'
+    match = STATEMENT_TABLES.get(operation, DEFAULT_STATEMENT_TABLE).search(statement)
+    return operation, match.group(1) if match else None
+
+
+def instrument_engine(engine, table_models):
+    """Count and time every statement on an engine, labelled by the model of its table"""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        operation, table = classify_statement(statement)
+        model = table_models.get(table, table or 'none')
+        DB_QUERIES.labels(model, operation).inc()
+        DB_LATENCY.labels(model, operation).observe(elapsed)
+
+    @event.listens_for(engine, 'handle_error')
+    def discard_query_timer(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_started'):
+            connection.info['query_started'].pop()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout takes, including waits for a free connection"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+@contextlib.contextmanager
+def timed_stage(stage):
+    """Record the run time of a block, or of a decorated function, as an onboarding stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ONBOARDING_STAGE.labels(stage).observe(time.perf_counter() - start)
+
+
+def record_request(route, method, status, elapsed):
+    HTTP_REQUESTS.labels(route, method, status).inc()
+    HTTP_LATENCY.labels(route, method).observe(elapsed)
+
+
+def render_metrics():
+    """Return (body, content type) in the Prometheus text format"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,192 @@
+"""
+Versioned schema migrations for the AXIOM Enterprise Integration Service.
+
+Each migration is registered with a version number and applied at most once;
+applied versions are recorded in the schema_migrations table. Migrations are
+written against the current models and must be safe to run on a database
+where the baseline create_all already produced the latest schema.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.schema import CreateIndex
+
+import timeseries
+from document_tags import tag_rows
+
+logger = logging.getLogger(__name__)
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations',
+    migration_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(255), nullable=False),
+    Column('applied_at', DateTime, default=datetime.utcnow)
+)
+
+# Arbitrary key for the Postgres advisory lock serializing concurrent upgrades
+MIGRATION_LOCK_ID = 7240021
+
+# Samples read and merged into the rollups per round trip while backfilling
+ROLLUP_BACKFILL_BATCH_SIZE = 10000
+TAG_BACKFILL_BATCH_SIZE = 10000
+
+MIGRATIONS = []
+
+def migration(version, name):
+    """Register a migration function under a schema version"""
+    def decorator(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return fn
+    return decorator
+
+def create_index(connection, index):
+    """Create an index unless it exists; unlike checkfirst this also works for expression indexes"""
+    connection.execute(CreateIndex(index, if_not_exists=True))
+
+@migration(1, 'baseline schema')
+def create_baseline(connection, metadata):
+    """Create all tables that do not exist yet"""
+    metadata.create_all(connection)
+
+@migration(2, 'per-client child table indexes')
+def create_child_indexes(connection, metadata):
+    """Index the client_id lookups on reminders, documents and progress_metrics"""
+    for table_name in ('reminders', 'documents', 'progress_metrics'):
+        for index in metadata.tables[table_name].indexes:
+            create_index(connection, index)
+
+@migration(3, 'native JSON columns')
+def convert_json_columns(connection, metadata):
+    """Convert JSON text columns to JSONB on Postgres; SQLite keeps JSON-encoded text"""
+    if connection.dialect.name != 'postgresql':
+        return
+    json_columns = {
+        'clients': ('business_context', 'current_challenges', 'recommended_solutions'),
+        'documents': ('tags',)
+    }
+    inspector = inspect(connection)
+    for table_name, column_names in json_columns.items():
+        column_types = {column['name']: column['type'] for column in inspector.get_columns(table_name)}
+        for column_name in column_names:
+            if isinstance(column_types[column_name], JSONB):
+                continue
+            connection.execute(text(
+                f"ALTER TABLE {table_name} ALTER COLUMN {column_name} TYPE JSONB USING {column_name}::jsonb"
+            ))
+
+@migration(4, 'updated_at on reminders and documents')
+def add_child_updated_at(connection, metadata):
+    """Track in-place updates of reminders and documents"""
+    inspector = inspect(connection)
+    for table_name in ('reminders', 'documents'):
+        if 'updated_at' in {column['name'] for column in inspector.get_columns(table_name)}:
+            continue
+        column_type = metadata.tables[table_name].c.updated_at.type.compile(connection.dialect)
+        connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN updated_at {column_type}"))
+        connection.execute(text(f"UPDATE {table_name} SET updated_at = created_at"))
+
+@migration(5, 'onboarding job queue')
+def create_onboarding_jobs(connection, metadata):
+    """Create the table backing asynchronous onboarding"""
+    metadata.tables['onboarding_jobs'].create(connection, checkfirst=True)
+
+@migration(6, 'webhook idempotency keys')
+def create_idempotency_keys(connection, metadata):
+    """Create the table recording processed payment webhooks"""
+    metadata.tables['idempotency_keys'].create(connection, checkfirst=True)
+
+@migration(7, 'revoked access tokens')
+def create_revoked_access_tokens(connection, metadata):
+    """Create the table holding revoked access token ids"""
+    metadata.tables['revoked_access_tokens'].create(connection, checkfirst=True)
+
+@migration(8, 'progress metric rollups')
+def create_progress_rollups(connection, metadata):
+    """Create the hourly and daily rollup tables and backfill them from existing samples"""
+    for index in metadata.tables['progress_metrics'].indexes:
+        create_index(connection, index)
+    tables = {'hour': metadata.tables['progress_metrics_hourly'], 'day': metadata.tables['progress_metrics_daily']}
+    for table in tables.values():
+        table.create(connection, checkfirst=True)
+    # Migration 1 may already have created empty rollup tables next to existing samples; only
+    # code at this version writes rollups, so empty tables mean nothing has been rolled up yet
+    samples = metadata.tables['progress_metrics']
+    if any(connection.execute(select(table.c.id).limit(1)).first() for table in tables.values()):
+        return
+    if connection.execute(select(samples.c.id).limit(1)).first() is None:
+        return
+    
+    result = connection.execute(
+        select(samples.c.client_id, samples.c.metric_name, samples.c.recorded_at, samples.c.metric_value)
+        .where(samples.c.recorded_at.is_not(None)),
+        execution_options={'yield_per': ROLLUP_BACKFILL_BATCH_SIZE}
+    )
+    backfilled = 0
+    for partition in result.partitions():
+        timeseries.roll_up(connection, tables, partition)
+        backfilled += len(partition)
+    logger.info(f"Backfilled progress rollups from {backfilled} samples")
+
+@migration(9, 'reminder scheduling')
+def add_reminder_scheduling(connection, metadata):
+    """Add reminders.notified_at and the (status, due_date) index used to find due reminders"""
+    if 'notified_at' not in {column['name'] for column in inspect(connection).get_columns('reminders')}:
+        column_type = metadata.tables['reminders'].c.notified_at.type.compile(connection.dialect)
+        connection.execute(text(f"ALTER TABLE reminders ADD COLUMN notified_at {column_type}"))
+    for index in metadata.tables['reminders'].indexes:
+        create_index(connection, index)
+
+@migration(10, 'document tag index')
+def create_document_tags(connection, metadata):
+    """Create document_tags and the title prefix index, indexing the tags of existing documents"""
+    tags = metadata.tables['document_tags']
+    tags.create(connection, checkfirst=True)
+    for index in metadata.tables['documents'].indexes:
+        create_index(connection, index)
+    
+    # Migration 1 may already have created an empty document_tags, so look for unindexed documents
+    # rather than at whether the table existed; documents without tags simply yield no rows
+    documents = metadata.tables['documents']
+    result = connection.execute(
+        select(documents.c.id, documents.c.client_id, documents.c.tags)
+        .where(~select(tags.c.document_id).where(tags.c.document_id == documents.c.id).exists()),
+        execution_options={'yield_per': TAG_BACKFILL_BATCH_SIZE}
+    )
+    indexed = 0
+    for partition in result.partitions():
+        rows = tag_rows(partition)
+        if rows:
+            connection.execute(tags.insert(), rows)
+        indexed += len(rows)
+    logger.info(f"Indexed {indexed} document tags")
+
+def current_version(connection):
+    """Return the highest applied schema version, or 0 for an unversioned database"""
+    schema_migrations.create(connection, checkfirst=True)
+    version = connection.execute(
+        select(schema_migrations.c.version).order_by(schema_migrations.c.version.desc()).limit(1)
+    ).scalar()
+    return version or 0
+
+def upgrade(engine, metadata):
+    """Apply all pending migrations in order and return the resulting version"""
+    with engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text('SELECT pg_advisory_xact_lock(:lock_id)'), {'lock_id': MIGRATION_LOCK_ID})
+
+        version = current_version(connection)
+        for migration_version, name, fn in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            logger.info(f"Applying schema migration {migration_version}: {name}")
+            fn(connection, metadata)
+            connection.execute(schema_migrations.insert().values(version=migration_version, name=name))
+            version = migration_version
+
+    return version
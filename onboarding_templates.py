@@ -0,0 +1,204 @@
+"""
+Data-driven onboarding content.
+
+The template registry is loaded once at startup from a JSON config file
+(onboarding_templates.json by default). Template strings are parsed ahead of
+time so fragments that do not mention the company name can be rendered once
+per (industry, complexity bucket) and reused across clients. Memoized
+fragments are also pre-encoded as JSON so database writes skip json.dumps;
+they are shared between clients and must not be mutated.
+"""
+import functools
+import json
+import string
+from datetime import timedelta
+
+DEFAULT_TEMPLATES_PATH = 'onboarding_templates.json'
+
+# Template fields that make a fragment specific to one client
+CLIENT_FIELDS = frozenset({'company_name', 'company_name_lower'})
+
+
+class EncodedList(list):
+    """A list carrying its own JSON encoding"""
+
+    def __init__(self, items):
+        super().__init__(items)
+        self.encoded = json.dumps(self)
+
+
+def encode_json(value):
+    """JSON serializer for database columns that reuses pre-encoded fragments"""
+    encoded = getattr(value, 'encoded', None)
+    if encoded is not None:
+        return encoded
+    return json.dumps(value)
+
+
+def template_fields(value):
+    """Return the format fields referenced anywhere in a template value"""
+    if isinstance(value, str):
+        return {field for _, field, _, _ in string.Formatter().parse(value) if field}
+    if isinstance(value, list):
+        return set().union(*(template_fields(item) for item in value))
+    if isinstance(value, dict):
+        return set().union(*(template_fields(item) for item in value.values()))
+    return set()
+
+
+def render(value, context):
+    """Render every template string inside a value"""
+    return compile_template(value)(context)
+
+
+def compile_template(value):
+    """
+    Compile a template value into a function of the render context. Literal
+    parts are captured once; only strings with format fields are formatted
+    on each call.
+    """
+    if isinstance(value, str):
+        if '{' in value:
+            return value.format_map
+        return lambda context: value
+    if isinstance(value, list):
+        items = [(compile_template(item), True) if template_fields(item) else (item, False) for item in value]
+        return lambda context: [item(context) if dynamic else item for item, dynamic in items]
+    if isinstance(value, dict):
+        static = {key: item for key, item in value.items() if not template_fields(item)}
+        dynamic = [(key, compile_template(item)) for key, item in value.items() if template_fields(item)]
+
+        def render_dict(context):
+            rendered = static.copy()
+            for key, item in dynamic:
+                rendered[key] = item(context)
+            return rendered
+        return render_dict
+    return lambda context: value
+
+
+def complexity_reduction(spec, complexity):
+    return f"{min(spec['cap'], complexity * spec['factor'])}%"
+
+
+def metric_value(spec, complexity):
+    value = spec['base']
+    if 'complexity_factor' in spec:
+        value += complexity * spec['complexity_factor']
+    if 'min' in spec:
+        value = max(spec['min'], value)
+    return value
+
+
+class TemplateRegistry:
+    """Compiled onboarding templates with memoized rendering"""
+
+    def __init__(self, config):
+        mentors = config['mentors']
+        self._mentors = mentors['by_industry']
+        self._default_mentor = mentors['default']
+        self._business_context = compile_template(config['business_context'])
+        self._challenges = [
+            (challenge.get('when', {}), {key: value for key, value in challenge.items() if key != 'when'})
+            for challenge in config['challenges']
+        ]
+        self._complexity_thresholds = tuple(sorted({
+            when['complexity_above'] for when, _ in self._challenges if 'complexity_above' in when
+        }))
+        self._solutions = config['solutions']
+        self._reminders = config['reminders']
+        self._documents = config['documents']
+        self._progress_baseline = config['progress_baseline']
+
+    @classmethod
+    def load(cls, path=DEFAULT_TEMPLATES_PATH):
+        with open(path) as templates_file:
+            return cls(json.load(templates_file))
+
+    def mentor(self, industry):
+        return self._mentors.get(industry, self._default_mentor)
+
+    def business_context(self, company_name, industry):
+        return self._business_context({'company_name': company_name, 'industry': industry})
+
+    def challenges(self, industry, complexity):
+        bucket = tuple([complexity > threshold for threshold in self._complexity_thresholds])
+        return self._challenges_for(industry, bucket)
+
+    @functools.lru_cache(maxsize=1024)
+    def _challenges_for(self, industry, bucket):
+        above = dict(zip(self._complexity_thresholds, bucket))
+        selected = []
+        for when, challenge in self._challenges:
+            if 'industry' in when and when['industry'] != industry:
+                continue
+            if 'complexity_above' in when and not above[when['complexity_above']]:
+                continue
+            selected.append(render(challenge, {'industry': industry}))
+        return EncodedList(selected)
+
+    @functools.lru_cache(maxsize=1024)
+    def solutions(self, complexity):
+        return EncodedList(
+            dict(solution, complexity_reduction=complexity_reduction(solution['complexity_reduction'], complexity))
+            for solution in self._solutions
+        )
+
+    def reminders(self, complexity, now, **fields):
+        """Reminder rows due relative to now, with extra row fields added"""
+        return [
+            {**reminder, 'due_date': now + due_in, **fields}
+            for reminder, due_in in self._reminders_for(complexity)
+        ]
+
+    @functools.lru_cache(maxsize=1024)
+    def _reminders_for(self, complexity):
+        return tuple(
+            ({key: value for key, value in render(reminder, {'complexity': complexity}).items() if key != 'due_in_days'},
+             timedelta(days=reminder['due_in_days']))
+            for reminder in self._reminders
+        )
+
+    def documents(self, company_name, industry, **fields):
+        """Document rows for a client, with extra row fields added"""
+        context = {'company_name': company_name, 'company_name_lower': company_name.lower()}
+        return [
+            {**document(context), **fields} if client_specific else {**document, **fields}
+            for document, client_specific in self._documents_for(industry)
+        ]
+
+    @functools.lru_cache(maxsize=1024)
+    def _documents_for(self, industry):
+        """
+        Render the industry into every document template. Documents that do
+        not mention the company are fully rendered and their tags pre-encoded;
+        the rest are compiled for per-client rendering.
+        """
+        context = {'industry': industry, 'industry_lower': industry.lower()}
+        compiled = []
+        for document in self._documents:
+            if template_fields(document) & CLIENT_FIELDS:
+                # Keep the company fields as placeholders for the per-client pass
+                partial = {**context, **{field: f'{{{field}}}' for field in CLIENT_FIELDS}}
+                compiled.append((compile_template(render(document, partial)), True))
+            else:
+                rendered = render(document, context)
+                rendered['tags'] = EncodedList(rendered.get('tags', []))
+                compiled.append((rendered, False))
+        return tuple(compiled)
+
+    def progress_baseline(self, complexity, **fields):
+        """Baseline progress metric rows, with extra row fields added"""
+        return [{**metric, **fields} for metric in self._progress_baseline_for(complexity)]
+
+    @functools.lru_cache(maxsize=1024)
+    def _progress_baseline_for(self, complexity):
+        return tuple(
+            {
+                'metric_name': metric['metric_name'],
+                'metric_value': metric_value(metric['value'], complexity),
+                'metric_type': metric['metric_type'],
+                'category': metric['category']
+            }
+            for metric in self._progress_baseline
+        )
@@ -0,0 +1,76 @@
+"""
+In-memory scheduling of database rows by due time.
+
+DueScheduler keeps a min-heap of (due_at, id) for the rows coming due
+soonest, so checking for due work is a look at the heap head rather than a
+query. Rows are loaded incrementally in key order through a loader: only
+those due before a lookahead horizon, a batch at a time, resuming after the
+last key loaded. Rows inserted behind the load cursor are picked up by a
+periodic rescan from the catch-up window.
+
+Firing is delegated to a callback that must claim rows atomically, since
+several processes may schedule the same rows; stale heap entries (rows
+changed or already claimed elsewhere) are expected and simply not claimed.
+"""
+import heapq
+from datetime import datetime, timedelta
+
+
+class DueScheduler:
+    """Min-heap of upcoming due rows, fed by load(after, before, limit) and drained by fire(ids, now)"""
+
+    def __init__(self, load, fire, batch_size=500, lookahead=300, rescan_interval=300, catchup=24 * 3600,
+                 clock=datetime.utcnow):
+        self.load = load
+        self.fire = fire
+        self.batch_size = batch_size
+        self.lookahead = timedelta(seconds=lookahead)
+        self.rescan_interval = timedelta(seconds=rescan_interval)
+        self.catchup = timedelta(seconds=catchup)
+        self.clock = clock
+        self._heap = []
+        self._scheduled = set()
+        self._cursor = None
+        self._next_load = None
+        self._next_rescan = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def next_due(self):
+        """Due time of the earliest scheduled row, or None"""
+        return self._heap[0][0] if self._heap else None
+
+    def poll(self):
+        """Fire every scheduled row that is due; returns whether any were fired"""
+        now = self.clock()
+        self._refill(now)
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, row_id = heapq.heappop(self._heap)
+            self._scheduled.discard(row_id)
+            due.append(row_id)
+        if not due:
+            return False
+        self.fire(due, now)
+        return True
+
+    def _refill(self, now):
+        if self._next_rescan is None or now >= self._next_rescan:
+            # Start over from the catch-up window so rows inserted behind the cursor are found
+            self._cursor = (now - self.catchup, 0)
+            self._next_load = now
+            self._next_rescan = now + self.rescan_interval
+        if now < self._next_load or len(self._heap) >= self.batch_size:
+            return
+
+        horizon = now + self.lookahead
+        rows = self.load(self._cursor, horizon, self.batch_size)
+        for due_at, row_id in rows:
+            if row_id not in self._scheduled:
+                self._scheduled.add(row_id)
+                heapq.heappush(self._heap, (due_at, row_id))
+        if rows:
+            self._cursor = tuple(rows[-1])
+        # A full batch means more rows are waiting before the horizon
+        self._next_load = now if len(rows) == self.batch_size else now + self.lookahead / 2
@@ -0,0 +1,218 @@
+"""
+Structured JSON logging that stays off the request thread.
+
+Request handlers only put log records on a bounded in-memory queue; a
+listener thread formats them as one JSON object per line and writes them to
+stdout. When the queue is full records are dropped and counted rather than
+blocking the request. High-volume events can be sampled per event name, and
+structured fields are redacted and truncated before they are written.
+
+Every record carries the current request id, so lines logged by onboarding
+helpers can be joined with the webhook line that triggered them.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+# Set for the duration of a request (or background job) and stamped on every record
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+REDACTED = '[REDACTED]'
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the request id of the thread that logged them"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of the records for configured event names. Warnings and
+    errors are never sampled out.
+    """
+
+    def __init__(self, rates, random=random.random):
+        super().__init__()
+        self.rates = rates
+        self.random = random
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, 'event', None))
+        if rate is None:
+            return True
+        record.sample_rate = rate
+        return self.random() < rate
+
+
+class Redactor:
+    """Mask sensitive keys and bound the size of structured log fields"""
+
+    def __init__(self, fields, max_length=256, max_items=20, max_depth=4):
+        self.fields = frozenset(field.lower() for field in fields)
+        self.max_length = max_length
+        self.max_items = max_items
+        self.max_depth = max_depth
+
+    def __call__(self, value, depth=0):
+        if isinstance(value, dict):
+            if depth >= self.max_depth:
+                return f'<dict with {len(value)} keys>'
+            items = list(value.items())
+            cleaned = {
+                str(key): REDACTED if str(key).lower() in self.fields else self(item, depth + 1)
+                for key, item in items[:self.max_items]
+            }
+            if len(items) > self.max_items:
+                cleaned['...'] = f'{len(items) - self.max_items} more keys'
+            return cleaned
+        if isinstance(value, (list, tuple)):
+            if depth >= self.max_depth:
+                return f'<list with {len(value)} items>'
+            cleaned = [self(item, depth + 1) for item in value[:self.max_items]]
+            if len(value) > self.max_items:
+                cleaned.append(f'... {len(value) - self.max_items} more items')
+            return cleaned
+        if isinstance(value, str):
+            if len(value) > self.max_length:
+                return f'{value[:self.max_length]}... ({len(value)} chars)'
+            return value
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        return self(str(value), depth)
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record and its `extra` fields as a single JSON line"""
+
+    def __init__(self, redactor):
+        super().__init__()
+        self.redactor = redactor
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None)
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and key not in entry:
+                entry[key] = self.redactor(value)
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that never blocks the caller. Records are queued as they
+    are, so message and exception formatting happen on the listener thread.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """The queue, its handler and the listener thread writing to the output stream"""
+
+    def __init__(self, stream_handler, max_queue_size):
+        self.max_queue_size = max_queue_size
+        self.queue = queue.Queue(max_queue_size)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.handler.addFilter(RequestIdFilter())
+        self.stream_handler = stream_handler
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.listener = logging.handlers.QueueListener(self.queue, self.stream_handler, respect_handler_level=True)
+            self.listener.start()
+
+    def restart_after_fork(self):
+        # The listener thread does not survive a fork; records still queued
+        # belong to the parent, so the child starts with an empty queue
+        self._lock = threading.Lock()
+        self.queue = queue.Queue(self.max_queue_size)
+        self.handler.queue = self.queue
+        self.start()
+
+    def stop(self):
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def stats(self):
+        return {'queued': self.queue.qsize(), 'dropped': self.handler.dropped}
+
+
+_pipeline = None
+
+
+def parse_sample_rates(value):
+    """Parse 'event=rate,event=rate' into a dict of sampling rates"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        event, _, rate = item.partition('=')
+        rates[event.strip()] = float(rate)
+    return rates
+
+
+def configure_logging(level='INFO', sample_rates=None, redact_fields=(), max_field_length=256,
+                      max_items=20, max_queue_size=10000, stream=None):
+    """
+    Route the root logger through the non-blocking JSON pipeline. Safe to
+    call more than once; the pipeline is created once per process.
+    """
+    global _pipeline
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _pipeline is not None:
+        return _pipeline
+
+    stream_handler = logging.StreamHandler(stream or sys.stdout)
+    stream_handler.setFormatter(JsonFormatter(Redactor(redact_fields, max_field_length, max_items)))
+
+    _pipeline = LogPipeline(stream_handler, max_queue_size)
+    if sample_rates:
+        _pipeline.handler.addFilter(SamplingFilter(sample_rates))
+    root.addHandler(_pipeline.handler)
+    _pipeline.start()
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_pipeline.restart_after_fork)
+    atexit.register(_pipeline.stop)
+    return _pipeline
+
+
+def get_log_pipeline():
+    return _pipeline
@@ -0,0 +1,78 @@
+import io
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import MalformedBody, iter_json_array, iter_ndjson
+
+
+class ChunkedStream(io.RawIOBase):
+    """Raw stream returning at most chunk_size bytes per read, like a socket"""
+
+    def __init__(self, data, chunk_size):
+        self.data = data
+        self.position = 0
+        self.chunk_size = chunk_size
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        size = self.chunk_size if size < 0 else min(size, self.chunk_size)
+        chunk = self.data[self.position:self.position + size]
+        self.position += len(chunk)
+        return chunk
+
+    def readinto(self, buffer):
+        chunk = self.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def sample_values(count, seed=1):
+    rng = random.Random(seed)
+    values = []
+    for index in range(count):
+        values.append({
+            'client_id': f'client-{index}',
+            'metric_name': 'Revenue ✓',
+            'metric_value': rng.choice([-2500.25, 1e-7, 12345678901234567890, 0, 3.5e+12, -0.0]),
+            'tags': [True, False, None]
+        })
+        # Bare numbers are where a read boundary can cut a value into a shorter valid one
+        values.append(rng.choice([-2500.25, 1e-7, 6.02E+23, 42, -17]))
+    return values
+
+
+@pytest.mark.parametrize('chunk_size', list(range(1, 17)) + [1000, 64 * 1024])
+def test_json_array_values_across_read_boundaries(chunk_size):
+    values = sample_values(200)
+    for separators in ((',', ':'), (', ', ': ')):
+        body = json.dumps(values, separators=separators, ensure_ascii=False).encode()
+        parsed = [value for _, value in iter_json_array(ChunkedStream(body, chunk_size))]
+        assert parsed == values
+
+
+def test_json_array_float_across_default_read_size():
+    # Put the read boundary just after the '.' of a float
+    prefix = b'[' + b' ' * (64 * 1024 - len(b'[-2500.')) + b'-2500.'
+    body = prefix + b'25, 1]'
+    assert [value for _, value in iter_json_array(ChunkedStream(body, 64 * 1024))] == [-2500.25, 1]
+
+
+@pytest.mark.parametrize('body', [b'[1.x]', b'[1, 2e]', b'[1 2]', b'{"a": 1}', b'[1,'])
+def test_json_array_malformed(body):
+    with pytest.raises(MalformedBody):
+        list(iter_json_array(ChunkedStream(body, 3)))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+def test_ndjson_lines_across_read_boundaries(chunk_size):
+    values = sample_values(50)
+    body = b''.join(json.dumps(value).encode() + b'\n' for value in values)
+    assert [value for _, value in iter_ndjson(ChunkedStream(body, chunk_size))] == values
@@ -0,0 +1,91 @@
+"""
+Downsampled rollups for progress metric samples.
+
+Samples are aggregated per client, metric name and time bucket into hourly
+and daily rollup rows holding the count, sum, min, max and the latest value.
+Rollups are maintained incrementally: each batch of new samples is reduced
+in memory and merged into the rollup tables with a single upsert, so the
+work per write is independent of how much history exists. Samples are
+treated as append-only; editing or deleting a raw sample does not adjust
+the rollups.
+"""
+from datetime import timedelta
+
+from sqlalchemy import case
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+RESOLUTIONS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+
+def bucket_start(recorded_at, resolution):
+    """Floor a timestamp to the start of its bucket"""
+    if resolution == 'hour':
+        return recorded_at.replace(minute=0, second=0, microsecond=0)
+    if resolution == 'day':
+        return recorded_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f'Unknown resolution: {resolution}')
+
+
+def aggregate(samples, resolution):
+    """
+    Reduce (client_id, metric_name, recorded_at, value) samples to one
+    rollup row per bucket.
+    """
+    buckets = {}
+    for client_id, metric_name, recorded_at, value in samples:
+        key = (client_id, metric_name, bucket_start(recorded_at, resolution))
+        row = buckets.get(key)
+        if row is None:
+            buckets[key] = {
+                'client_id': client_id,
+                'metric_name': metric_name,
+                'bucket_start': key[2],
+                'sample_count': 1,
+                'value_sum': value,
+                'min_value': value,
+                'max_value': value,
+                'last_value': value,
+                'last_recorded_at': recorded_at
+            }
+            continue
+        row['sample_count'] += 1
+        row['value_sum'] += value
+        row['min_value'] = min(row['min_value'], value)
+        row['max_value'] = max(row['max_value'], value)
+        if recorded_at >= row['last_recorded_at']:
+            row['last_value'] = value
+            row['last_recorded_at'] = recorded_at
+    return list(buckets.values())
+
+
+def upsert_rollups(connection, table, rows):
+    """Merge pre-aggregated rollup rows into a rollup table"""
+    if not rows:
+        return
+    dialect_insert = postgresql_insert if connection.dialect.name == 'postgresql' else sqlite_insert
+    statement = dialect_insert(table)
+    excluded = statement.excluded
+    newer = excluded.last_recorded_at >= table.c.last_recorded_at
+    statement = statement.on_conflict_do_update(
+        index_elements=['client_id', 'metric_name', 'bucket_start'],
+        set_={
+            'sample_count': table.c.sample_count + excluded.sample_count,
+            'value_sum': table.c.value_sum + excluded.value_sum,
+            'min_value': case((excluded.min_value < table.c.min_value, excluded.min_value), else_=table.c.min_value),
+            'max_value': case((excluded.max_value > table.c.max_value, excluded.max_value), else_=table.c.max_value),
+            'last_value': case((newer, excluded.last_value), else_=table.c.last_value),
+            'last_recorded_at': case((newer, excluded.last_recorded_at), else_=table.c.last_recorded_at)
+        }
+    )
+    connection.execute(statement, rows)
+
+
+def roll_up(connection, tables, samples):
+    """Merge samples into every resolution's rollup table; tables maps resolution to Table"""
+    samples = list(samples)
+    for resolution, table in tables.items():
+        upsert_rollups(connection, table, aggregate(samples, resolution))
@@ -0,0 +1,143 @@
+"""
+Stateless signed access tokens.
+
+A token is `axiom.<kid>.<claims>.<signature>`. The claims are base64url
+JSON holding the client id, scopes, expiry and a token id, and they are
+signed with HMAC-SHA256 under a key derived from a secret. The first secret
+signs; every secret verifies, so SECRET_KEY can be rotated by moving the old
+value to SECRET_KEY_FALLBACKS without invalidating issued tokens. The key id
+selects the verifying key directly.
+
+Verification is pure computation. Tokens that verified are kept in a small
+LRU so repeat requests skip the HMAC and JSON decode. Expiry and the
+in-memory revocation list are still checked on every use.
+"""
+import base64
+import functools
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from collections import namedtuple
+
+TOKEN_PREFIX = 'axiom'
+
+TokenClaims = namedtuple('TokenClaims', ['client_id', 'scopes', 'expires_at', 'token_id'])
+
+
+class InvalidToken(Exception):
+    """The token is malformed, forged, expired, revoked or lacks access"""
+
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class RevocationList:
+    """
+    Revoked token ids held in memory. A loader supplying the current ids
+    from shared storage is called at most once per refresh interval, so
+    revocations made by other processes apply within that interval.
+    """
+
+    def __init__(self, refresh_interval=30, clock=time.monotonic):
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self._token_ids = frozenset()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, token_id):
+        return token_id in self._token_ids
+
+    def __len__(self):
+        return len(self._token_ids)
+
+    def add(self, token_id):
+        with self._lock:
+            self._token_ids = self._token_ids | {token_id}
+
+    def refresh_if_stale(self, loader):
+        if self._loaded_at is not None and self.clock() - self._loaded_at < self.refresh_interval:
+            return
+        # One thread reloads; the others keep using the current list
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._token_ids = frozenset(loader())
+            self._loaded_at = self.clock()
+        finally:
+            self._lock.release()
+
+
+class TokenSigner:
+    """Issues and verifies access tokens for a set of secrets, newest first"""
+
+    def __init__(self, secret_keys, ttl=30 * 24 * 3600, cache_size=4096, revocation_refresh=30):
+        self._keys = {}
+        for secret in secret_keys:
+            secret = secret.encode() if isinstance(secret, str) else secret
+            # Derived so tokens never share a key with sessions or other signatures
+            key = hmac.new(secret, b'axiom-access-token', hashlib.sha256).digest()
+            self._keys.setdefault(hashlib.sha256(key).hexdigest()[:8], key)
+        if not self._keys:
+            raise ValueError('At least one secret key is required')
+        self._signing_kid = next(iter(self._keys))
+        self.ttl = ttl
+        self.revoked = RevocationList(revocation_refresh)
+        self._decode = functools.lru_cache(maxsize=cache_size)(self._decode_uncached)
+
+    def issue(self, client_id, scopes, ttl=None, now=None):
+        now = int(now if now is not None else time.time())
+        claims = {
+            'sub': client_id,
+            'scp': sorted(scopes),
+            'exp': now + (ttl if ttl is not None else self.ttl),
+            'jti': secrets.token_hex(8)
+        }
+        payload = b64encode(json.dumps(claims, separators=(',', ':')).encode())
+        signing_input = f'{TOKEN_PREFIX}.{self._signing_kid}.{payload}'
+        return f'{signing_input}.{self._sign(self._keys[self._signing_kid], signing_input)}'
+
+    def verify(self, token, client_id=None, scope=None, now=None):
+        """Return the token's claims, or raise InvalidToken"""
+        claims = self._decode(token)
+        if claims.expires_at <= (now if now is not None else time.time()):
+            raise InvalidToken('Token expired')
+        if claims.token_id in self.revoked:
+            raise InvalidToken('Token revoked')
+        if client_id is not None and claims.client_id != client_id:
+            raise InvalidToken('Token is not valid for this client')
+        if scope is not None and scope not in claims.scopes:
+            raise InvalidToken(f'Token lacks the {scope} scope')
+        return claims
+
+    def cache_info(self):
+        return self._decode.cache_info()._asdict()
+
+    def _decode_uncached(self, token):
+        # Raising keeps failed tokens out of the LRU
+        parts = token.split('.')
+        if len(parts) != 4 or parts[0] != TOKEN_PREFIX:
+            raise InvalidToken('Malformed token')
+        _, kid, payload, signature = parts
+        key = self._keys.get(kid)
+        if key is None:
+            raise InvalidToken('Unknown signing key')
+        if not hmac.compare_digest(signature, self._sign(key, token.rpartition('.')[0])):
+            raise InvalidToken('Bad signature')
+        try:
+            claims = json.loads(b64decode(payload))
+            return TokenClaims(claims['sub'], frozenset(claims['scp']), claims['exp'], claims['jti'])
+        except (ValueError, KeyError, TypeError):
+            raise InvalidToken('Malformed token')
+
+    @staticmethod
+    def _sign(key, signing_input):
+        return b64encode(hmac.new(key, signing_input.encode(), hashlib.sha256).digest())